@@ -3,6 +3,7 @@ from config import Config
 from flask_cors import CORS
 
 from database.complaint_db import init_db  
+from utils.resources import PRELOAD_RESOURCES, preload_resources
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -11,5 +12,7 @@ def create_app(config_class=Config):
     init_db()
     from main.routes import main
     app.register_blueprint(main)
+    if PRELOAD_RESOURCES:
+        preload_resources()
 
     return app
@@ -1,17 +1,27 @@
-import uuid
 import os
+import hashlib
 import time
+import json
+import numpy as np
 from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import google.generativeai as genai
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from utils.request_budget import RequestBudget
+from utils.embedding_cache import EmbeddingMemo
 load_dotenv()
 
+# In-process LRU keyed on (model, "clustering" task type, proposition text); no Redis or disk tier, so each
+# chunking process keeps its own and re-embeds a proposition only after it has been evicted
+_clustering_memo = EmbeddingMemo()
+
 class AgenticChunker:
-    def __init__(self, gemini_api_key=None):
+    def __init__(self, gemini_api_key=None, batch_size=None, use_embeddings=False,
+                 similarity_threshold=0.85, ambiguity_margin=0.1, request_budget=None, response_cache=None):
         self.chunks = {}
         self.id_truncate_limit = 5
         self.generate_new_metadata_ind = True
@@ -19,6 +29,15 @@ class AgenticChunker:
         self.api_call_count = 0  # Initialize API call counter
         self.api_limit = 14  # API call limit
         self.pause_duration = 60  # Pause duration in seconds
+        self.request_budget = request_budget  # Shared RequestBudget, replaces the per-instance limit when set
+        self.response_cache = response_cache  # Optional LLMResponseCache consulted before every call
+        self.batch_size = batch_size  # Propositions routed per call, None routes one at a time
+        self.stale_chunk_ids = set()  # Chunks whose summary/title must be regenerated
+        self.use_embeddings = use_embeddings  # Route by centroid similarity instead of the chunk outline
+        self.similarity_threshold = similarity_threshold  # Attach without asking the LLM at or above this
+        self.ambiguity_margin = ambiguity_margin  # Band below the threshold where the LLM decides
+        self.embedding_model = "models/embedding-001"
+        self.embedding_batch_limit = 100  # Max texts per embed_content call
 
         if gemini_api_key is None:
             gemini_api_key = os.getenv("GOOGLE_API_KEY")
@@ -26,26 +45,175 @@ class AgenticChunker:
             raise ValueError("API key is not provided and not found in environment variables")
 
         genai.configure(api_key=gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        self.model_name = 'gemini-2.0-flash'
+        self.model = genai.GenerativeModel(self.model_name)
 
     def _check_api_limit(self):
+        if self.request_budget is not None:
+            self.request_budget.acquire()
+            return
         if self.api_call_count >= self.api_limit:
             print(f"API call limit reached ({self.api_call_count}). Pausing for {self.pause_duration} seconds...")
             time.sleep(self.pause_duration)
             self.api_call_count = 0  # Reset counter after pause
 
-    def _make_api_call(self, prompt):
+    def _make_api_call(self, prompt, generation_config=None):
+        if self.response_cache is not None:
+            cached = self.response_cache.get(self.model_name, prompt, generation_config)
+            if cached is not None:
+                return cached
+
         self._check_api_limit()  # Check if we need to pause before making the call
         print(f"Making API call #{self.api_call_count + 1} with prompt: {prompt[:50]}...")
-        response = self.model.generate_content(prompt)
+        response = self.model.generate_content(prompt, generation_config=generation_config)
         self.api_call_count += 1  # Increment the counter after the call
         print(f"API call #{self.api_call_count} completed.")
+
+        if self.response_cache is not None:
+            self.response_cache.put(self.model_name, prompt, response.text, generation_config)
         return response.text
 
     def add_propositions(self, propositions):
         for proposition in propositions:
             self.add_proposition(proposition)
 
+    def add_propositions_batched(self, propositions):
+        """
+        Routes propositions in windows of `batch_size` with one call per window,
+        then regenerates the summary and title of every grown chunk once.
+        """
+        for start in range(0, len(propositions), self.batch_size):
+            window = propositions[start:start + self.batch_size]
+            if not self._route_batch(window):
+                if self.print_logging:
+                    print("Batch routing failed, routing window one proposition at a time")
+                for proposition in window:
+                    self.add_proposition(proposition)
+        self.refresh_stale_chunks()
+
+    def _route_batch(self, propositions):
+        numbered = "\n".join(f"{i}: {p}" for i, p in enumerate(propositions))
+        prompt = f"""
+        You are the steward of a group of chunks which represent groups of sentences that talk about a similar topic.
+        Assign every proposition below to a chunk. A proposition should belong to a chunk if their meaning, direction, or intention are similar.
+        Use the id of an existing chunk when one fits. Otherwise use a new label such as "new-1", and give the same label
+        to propositions in this list that should start the same new chunk.
+        For every new label, write a very brief 1-sentence summary and a very brief few word title.
+        Your summaries and titles should anticipate generalization. If you get a proposition about apples, generalize it to food.
+
+        Current Chunks:
+        --Start of current chunks--
+        {self.get_chunk_outline() or "No chunks"}
+        --End of current chunks--
+
+        Propositions:
+        {numbered}
+
+        Respond with JSON only, in this form:
+        {{"assignments": [{{"index": 0, "chunk": "<chunk id or new label>"}}],
+          "new_chunks": {{"new-1": {{"title": "<title>", "summary": "<summary>"}}}}}}
+        """
+        try:
+            response_text = self._make_api_call(prompt, generation_config={"response_mime_type": "application/json"})
+            routing = json.loads(response_text)
+            assignments = {int(a["index"]): str(a["chunk"]).strip() for a in routing["assignments"]}
+            new_chunks = routing.get("new_chunks", {})
+        except Exception as e:
+            print(f"❌ Could not parse batch routing response: {e}")
+            return False
+
+        if set(assignments) != set(range(len(propositions))):
+            return False
+
+        label_to_id = {}
+        for i, proposition in enumerate(propositions):
+            label = assignments[i]
+            if label in self.chunks:
+                self.chunks[label]['propositions'].append(proposition)
+                self.stale_chunk_ids.add(label)
+            elif label in label_to_id:
+                self.chunks[label_to_id[label]]['propositions'].append(proposition)
+            else:
+                metadata = new_chunks.get(label) or {}
+                label_to_id[label] = self._add_chunk(
+                    [proposition],
+                    title=metadata.get("title", proposition),
+                    summary=metadata.get("summary", proposition),
+                )
+                if not metadata:
+                    self.stale_chunk_ids.add(label_to_id[label])
+        return True
+
+    def add_propositions_by_embedding(self, propositions):
+        """
+        Routes each proposition to the chunk with the closest running centroid.
+        Only similarities inside the ambiguity band fall back to the LLM, and then
+        with an outline of the candidate chunks rather than all of them.
+        """
+        vectors = self._embed(propositions)
+        lower_bound = self.similarity_threshold - self.ambiguity_margin
+
+        for proposition, vector in zip(propositions, vectors):
+            if not self.chunks:
+                self._add_embedded_chunk(proposition, vector)
+                continue
+
+            chunk_ids = list(self.chunks)
+            centroids = np.stack([self.chunks[c]['centroid'] for c in chunk_ids])
+            norms = np.linalg.norm(centroids, axis=1) * np.linalg.norm(vector)
+            similarities = centroids @ vector / np.maximum(norms, 1e-12)
+            best = int(np.argmax(similarities))
+
+            if similarities[best] >= self.similarity_threshold:
+                chunk_id = chunk_ids[best]
+            elif similarities[best] >= lower_bound:
+                candidates = [c for c, sim in zip(chunk_ids, similarities) if sim >= lower_bound]
+                chunk_id = self._find_relevant_chunk(proposition, candidates)
+                if chunk_id not in self.chunks:
+                    chunk_id = None
+            else:
+                chunk_id = None
+
+            if chunk_id:
+                if self.print_logging:
+                    print(f"Chunk Found ({chunk_id}) with similarity {similarities[chunk_ids.index(chunk_id)]:.2f}")
+                chunk = self.chunks[chunk_id]
+                count = len(chunk['propositions'])
+                chunk['centroid'] = (chunk['centroid'] * count + vector) / (count + 1)
+                chunk['propositions'].append(proposition)
+                self.stale_chunk_ids.add(chunk_id)
+            else:
+                self._add_embedded_chunk(proposition, vector)
+        self.refresh_stale_chunks()
+
+    def _add_embedded_chunk(self, proposition, vector):
+        chunk_id = self._add_chunk([proposition], title=proposition, summary=proposition)
+        self.chunks[chunk_id]['centroid'] = vector
+        self.stale_chunk_ids.add(chunk_id)
+
+    def _embed(self, texts):
+        def compute(batch_texts):
+            vectors = []
+            for start in range(0, len(batch_texts), self.embedding_batch_limit):
+                response = genai.embed_content(
+                    model=self.embedding_model,
+                    content=batch_texts[start:start + self.embedding_batch_limit],
+                    task_type="clustering"
+                )
+                vectors.extend(response["embedding"])
+            return vectors
+
+        vectors = _clustering_memo.get_or_compute(self.embedding_model, "clustering", texts, compute)
+        return [np.asarray(v, dtype=np.float32) for v in vectors]
+
+    def refresh_stale_chunks(self):
+        """Regenerates summary and title once for each chunk that grew since its metadata was written."""
+        for chunk_id in list(self.stale_chunk_ids):
+            chunk = self.chunks[chunk_id]
+            chunk['summary'] = self._update_chunk_summary(chunk)
+            chunk['title'] = self._update_chunk_title(chunk)
+        self.stale_chunk_ids.clear()
+
     def add_proposition(self, proposition):
         if self.print_logging:
             print(f"\nAdding: '{proposition}'")
@@ -141,28 +309,36 @@ class AgenticChunker:
         return self._make_api_call(prompt)
 
     def _create_new_chunk(self, proposition):
-        new_chunk_id = str(uuid.uuid4())[:self.id_truncate_limit]
         new_chunk_summary = self._get_new_chunk_summary(proposition)
         new_chunk_title = self._get_new_chunk_title(new_chunk_summary)
+        self._add_chunk([proposition], title=new_chunk_title, summary=new_chunk_summary)
+
+    def _add_chunk(self, propositions, title, summary):
+        # Derived from content rather than random so re-runs produce the same prompts and hit the response cache
+        seed = f"{len(self.chunks)}:{propositions[0]}".encode("utf-8")
+        new_chunk_id = hashlib.sha1(seed).hexdigest()[:self.id_truncate_limit]
         self.chunks[new_chunk_id] = {
             'chunk_id': new_chunk_id,
-            'propositions': [proposition],
-            'title': new_chunk_title,
-            'summary': new_chunk_summary,
+            'propositions': list(propositions),
+            'title': title,
+            'summary': summary,
             'chunk_index': len(self.chunks)
         }
         if self.print_logging:
-            print(f"Created new chunk ({new_chunk_id}): {new_chunk_title}")
+            print(f"Created new chunk ({new_chunk_id}): {title}")
+        return new_chunk_id
 
-    def get_chunk_outline(self):
+    def get_chunk_outline(self, chunk_ids=None):
         chunk_outline = ""
         for chunk_id, chunk in self.chunks.items():
+            if chunk_ids is not None and chunk_id not in chunk_ids:
+                continue
             single_chunk_string = f"""Chunk ID: {chunk['chunk_id']}\nChunk Name: {chunk['title']}\nChunk Summary: {chunk['summary']}\n\n"""
             chunk_outline += single_chunk_string
         return chunk_outline
 
-    def _find_relevant_chunk(self, proposition):
-        current_chunk_outline = self.get_chunk_outline()
+    def _find_relevant_chunk(self, proposition, chunk_ids=None):
+        current_chunk_outline = self.get_chunk_outline(chunk_ids)
         prompt = f"""
         Determine whether or not the "Proposition" should belong to any of the existing chunks.
         A proposition should belong to a chunk if their meaning, direction, or intention are similar.
@@ -223,11 +399,56 @@ class AgenticChunker:
         
         for i in document_strings:
             print(i)
-        self.add_propositions(document_strings)
+        if self.use_embeddings:
+            self.add_propositions_by_embedding(document_strings)
+        elif self.batch_size:
+            self.add_propositions_batched(document_strings)
+        else:
+            self.add_propositions(document_strings)
         print(self.pretty_print_chunk_outline())
         return self.chunks
     
 
+_worker_request_budget = None
+
+def _init_chunking_worker(request_budget):
+    global _worker_request_budget
+    _worker_request_budget = request_budget
+
+def _chunk_text_worker(text, chunker_kwargs):
+    ac = AgenticChunker(request_budget=_worker_request_budget, **chunker_kwargs)
+    ac.chunk(text)
+    return ac.get_chunks(get_type='list_of_strings')
+
+def chunk_texts_parallel(texts, workers, requests_per_minute=14, **chunker_kwargs):
+    """
+    Chunks independent texts in a process pool that shares one request budget.
+    Texts are pulled lazily with at most two per worker in flight, so `texts`
+    may be a stream. Yields (position, chunks) as each text finishes; texts
+    whose chunking fails are reported and yielded as (position, None).
+    """
+    request_budget = RequestBudget(requests_per_minute, period=60)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_chunking_worker,
+                             initargs=(request_budget,)) as pool:
+        futures = {}
+        for position, text in enumerate(texts):
+            futures[pool.submit(_chunk_text_worker, text, chunker_kwargs)] = position
+            if len(futures) >= workers * 2:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                yield from _collect_chunked(done, futures)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            yield from _collect_chunked(done, futures)
+
+def _collect_chunked(done, futures):
+    for future in done:
+        position = futures.pop(future)
+        try:
+            yield position, future.result()
+        except Exception as e:
+            print(f"❌ Chunking failed for text #{position}: {e}")
+            yield position, None
+
 
 if __name__ == "__main__":
     ac = AgenticChunker()
@@ -1,3 +1,4 @@
+import asyncio
 from langchain_core.runnables import RunnableLambda
 from database.complaint_db import insert_complaint
 from agents.notification_agent import get_notification_agent
@@ -13,16 +14,28 @@ Issue Description: {description}
 The summary should be clear, concise, and professional.
 """
 
+def _validate(payload):
+    description = payload.get("query", "").strip()
+    email = payload.get("email", "").strip()
+    if not description or not email:
+        return description, email, {
+            "result": "⚠️ Please provide both your issue and email so we can help you.",
+            "summary": None
+        }
+    return description, email, None
+
+def _notification_payload(email, summary):
+    return {
+        "summary": summary,
+        "email": email,
+        "name": email.split("@")[0]  # fallback name from email
+    }
+
 def get_appointment_agent():
     def invoke(payload):
-        description = payload.get("query", "").strip()
-        email = payload.get("email", "").strip()
-
-        if not description or not email:
-            return {
-                "result": "⚠️ Please provide both your issue and email so we can help you.",
-                "summary": None
-            }
+        description, email, error = _validate(payload)
+        if error:
+            return error
 
         print(f"[Appointment Agent] Logging issue from {email}: {description}")
 
@@ -39,19 +52,40 @@ def get_appointment_agent():
         insert_complaint(email=email, query=description, summary=summary)
         print(f"✅ Complaint inserted for: {email}")
 
-        # Generate summary
-        
-
         # Notify support team
-        notify_result = get_notification_agent().invoke({
-            "summary": summary,
-            "email": email,
-            "name": email.split("@")[0]  # fallback name from email
-        })
+        notify_result = get_notification_agent().invoke(_notification_payload(email, summary))
+
+        return {
+            "result": "✅ Your complaint has been logged. Our support team will contact you shortly.",
+            "summary": summary
+        }
+
+    async def ainvoke(payload):
+        description, email, error = _validate(payload)
+        if error:
+            return error
+
+        print(f"[Appointment Agent] Logging issue from {email}: {description}")
+
+        llm = get_llm()
+        try:
+            summary_prompt = generate_summary_prompt(email, description)
+            summary = (await llm.ainvoke(summary_prompt)).content.strip()
+        except Exception as e:
+            print(f"❌ Summary generation failed: {e}")
+            summary = f"Complaint from {email}: {description}"
+
+        print(f"[Appointment Agent] Summary:\n{summary}")
+        # Store in DB
+        await asyncio.to_thread(insert_complaint, email=email, query=description, summary=summary)
+        print(f"✅ Complaint inserted for: {email}")
+
+        # Notify support team; SMTP is blocking, so RunnableLambda runs it in a worker thread
+        notify_result = await get_notification_agent().ainvoke(_notification_payload(email, summary))
 
         return {
             "result": "✅ Your complaint has been logged. Our support team will contact you shortly.",
             "summary": summary
         }
 
-    return RunnableLambda(invoke)
+    return RunnableLambda(invoke, afunc=ainvoke)
@@ -1,43 +1,20 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 from langchain_core.runnables import RunnableLambda
-from utils.memory import build_context, add_to_memory, get_memory_for_user
-from main.utils import create_qa_chain1
-from langchain_community.vectorstores import Pinecone as PineconeVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from utils.memory import TURN_INTENTS, build_context, add_to_memory, get_memory_for_user, format_turn
+from utils.resources import PINECONE_INDEX_NAME1, get_faq_qa_chain, get_fused_faq_chain
+from utils.answer_cache import invoke_qa_chain, ainvoke_qa_chain
 from utils.llm import get_llm
-from utils.memory import get_memory_for_user
 
 load_dotenv()
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME1 = os.getenv("PINECONE_INDEX_NAME1")  # FAQ index name
-print(f"[FAQ Agent] PINECONE_INDEX_NAME1: {PINECONE_INDEX_NAME1}")
-
-def load_vector_store1():
-    try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        vector_store = PineconeVectorStore.from_existing_index(
-            index_name=PINECONE_INDEX_NAME1,
-            embedding=embeddings
-        )
-        print("[FAQ Agent] Vector store loaded successfully.")
-        return vector_store
-    except Exception as e:
-        print(f"❌ Error loading vector store: {e}")
-        return None
-
-vector_store = load_vector_store1()
-qa_chain = create_qa_chain1(vector_store)
-
-def detect_intent_gemini(query: str, email: str) -> str:
-    llm = get_llm()
-
+def _intent_prompt(query: str, email: str) -> str:
     # Get last 3 messages to provide context
     memory = get_memory_for_user(email)
-    history = "\n".join(memory[-3:]) if memory else ""
+    history = "\n".join(format_turn(turn) for turn in memory[-3:]) if memory else ""
 
-    prompt = f"""
+    return f"""
                 You are an intent classification assistant. Based on the conversation history and the user's latest message,
                 determine the most appropriate intent from the following options:
 
@@ -54,55 +31,147 @@ def detect_intent_gemini(query: str, email: str) -> str:
                 Return only one word: complaint, affirmation, or general.
                 """
 
-    response = llm.invoke(prompt)
+def _parse_intent(response) -> str:
     intent = response.content.strip().lower()
 
-    if intent not in ["complaint", "affirmation", "general"]:
+    if intent not in TURN_INTENTS:
         return "general"  # fallback intent
 
     return intent
 
+def detect_intent_gemini(query: str, email: str) -> str:
+    llm = get_llm()
+    return _parse_intent(llm.invoke(_intent_prompt(query, email)))
+
+async def adetect_intent_gemini(query: str, email: str) -> str:
+    llm = get_llm()
+    return _parse_intent(await llm.ainvoke(_intent_prompt(query, email)))
+
+def _turn_intent(turn, email):
+    """Intent stored with a memory turn; turns stored without one are classified once and keep the result."""
+    if turn.get("intent") is None:
+        turn["intent"] = detect_intent_gemini(turn["query"], email)
+    return turn["intent"]
+
+async def _aturn_intent(turn, email):
+    if turn.get("intent") is None:
+        turn["intent"] = await adetect_intent_gemini(turn["query"], email)
+    return turn["intent"]
+
+def _fused_payload(query: str, email: str) -> dict:
+    memory = get_memory_for_user(email)
+    history = "\n".join(f"{format_turn(turn)}\nIntent: {turn.get('intent') or 'unknown'}" for turn in memory[-3:])
+    return {"query": build_context(email, query), "message": query, "history": history}
+
+def fused_faq_answer(query: str, email: str):
+    """
+    Answer from the FAQ index and label the message in one structured-output call.
+    Returns the answer, intent, escalate and source_documents, or None if the call is unavailable.
+    """
+    chain = get_fused_faq_chain()
+    if chain is None:
+        return None
+    try:
+        return chain.invoke(_fused_payload(query, email))
+    except Exception as e:
+        print(f"❌ Fused FAQ call failed: {e}")
+        return None
+
+async def afused_faq_answer(query: str, email: str):
+    chain = get_fused_faq_chain()
+    if chain is None:
+        return None
+    try:
+        return await chain.ainvoke(_fused_payload(query, email))
+    except Exception as e:
+        print(f"❌ Fused FAQ call failed: {e}")
+        return None
+
+def _faq_response(email, query, result, intent, escalation_confirmed):
+    response_text = result["result"]
+    source_documents = result.get("source_documents", [])
+
+    if intent == "complaint":
+        followup = "Would you like further assistance from our customer care team?"
+        add_to_memory(email, query, followup, intent=intent)
+        return {
+            "result": f"{response_text}\n\n{followup}",
+            "intent": intent,
+            "escalate": False,
+            "source_documents": source_documents
+        }
+
+    # Case 2: Affirmation received after a previous complaint - escalate
+    elif escalation_confirmed:
+        return {
+            "result": "Okay, I will connect you with our customer care team for further assistance with your issue. Please wait while I transfer you.",
+            "intent": intent,
+            "escalate": True,
+            "source_documents": source_documents,
+            "query": "The user confirmed they need support. Please proceed with escalation."
+        }
+
+    # Case 3: General inquiries (no escalation)
+    return {
+        "result": response_text,
+        "intent": intent,
+        "escalate": False,
+        "source_documents": source_documents
+    }
+
 def get_faq_agent():
     def invoke(payload):
         query = payload.get("query")
         email = payload.get("email")
+        fused = payload.get("fused")
 
         print(f"[FAQ Agent] Query: {query} | Email: {email}")
-        contextual_query = build_context(email, query)
-        result = qa_chain.invoke({"query": contextual_query})
-        response_text = result["result"]
+        if fused:
+            # Answer and intent already came from the router's fused call
+            result = {"result": fused["answer"], "source_documents": fused["source_documents"]}
+            turn = add_to_memory(email, query, result["result"])
+            intent = turn["intent"] = fused["intent"]
+        else:
+            contextual_query = build_context(email, query)
+            # FAQ answers follow the user's own conversation (complaints, escalations), so they aren't shared
+            result = invoke_qa_chain(
+                get_faq_qa_chain(), PINECONE_INDEX_NAME1, contextual_query, payload.get("documents"), use_cache=False
+            )
+            turn = add_to_memory(email, query, result["result"])
+            intent = turn["intent"] = detect_intent_gemini(query, email)
+        print(f"[FAQ Agent] Detected intent: {intent}")
+
+        # Earlier turns carry the intent classified when they were stored
+        memory = get_memory_for_user(email)
+        escalation_confirmed = intent == "affirmation" and (bool(fused and fused["escalate"]) or any(
+            _turn_intent(past_turn, email) == "complaint" for past_turn in memory[-3:]
+        ))
+        return _faq_response(email, query, result, intent, escalation_confirmed)
 
-        add_to_memory(email, query, response_text)
+    async def ainvoke(payload):
+        query = payload.get("query")
+        email = payload.get("email")
+        fused = payload.get("fused")
 
-        intent = detect_intent_gemini(query, email)
+        print(f"[FAQ Agent] Query: {query} | Email: {email}")
+        if fused:
+            result = {"result": fused["answer"], "source_documents": fused["source_documents"]}
+            turn = add_to_memory(email, query, result["result"])
+            intent = turn["intent"] = fused["intent"]
+        else:
+            contextual_query = build_context(email, query)
+            result = await ainvoke_qa_chain(
+                get_faq_qa_chain(), PINECONE_INDEX_NAME1, contextual_query, payload.get("documents"), use_cache=False
+            )
+            turn = add_to_memory(email, query, result["result"])
+            intent = turn["intent"] = await adetect_intent_gemini(query, email)
         print(f"[FAQ Agent] Detected intent: {intent}")
 
-        memory = get_memory_for_user(email)
-        last_user_msg = memory[-1].split("User:")[-1].strip().lower() if memory else ""
-
-        if intent == "complaint":
-            followup = "Would you like further assistance from our customer care team?"
-            add_to_memory(email, query, followup)
-            return {
-                "result": f"{response_text}\n\n{followup}",
-                "intent": intent,
-                "escalate": False
-            }
-
-        # Case 2: Affirmation received after a previous complaint - escalate
-        elif intent == "affirmation" and any("complaint" in detect_intent_gemini(msg.split("User:")[-1], email) for msg in memory[-3:]):
-            return {
-                "result": "Okay, I will connect you with our customer care team for further assistance with your issue. Please wait while I transfer you.",
-                "intent": intent,
-                "escalate": True,
-                "query": "The user confirmed they need support. Please proceed with escalation."
-            }
-
-        # Case 3: General inquiries (no escalation)
-        return {
-            "result": response_text,
-            "intent": intent,
-            "escalate": False
-        }
+        escalation_confirmed = intent == "affirmation" and bool(fused and fused["escalate"])
+        if intent == "affirmation" and not escalation_confirmed:
+            memory = get_memory_for_user(email)
+            history_intents = await asyncio.gather(*[_aturn_intent(past_turn, email) for past_turn in memory[-3:]])
+            escalation_confirmed = "complaint" in history_intents
+        return _faq_response(email, query, result, intent, escalation_confirmed)
 
-    return RunnableLambda(invoke)
+    return RunnableLambda(invoke, afunc=ainvoke)
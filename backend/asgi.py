@@ -0,0 +1,139 @@
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from __init__ import create_app
+from main.followup import asubmit_followups, await_followup_job
+from main.langgraph_flow import GraphState
+from main.routes import (
+    STREAM_FOLLOWUP_TIMEOUT, make_links_clickable, detect_language, translate_text, afollowup_translator, sse_event
+)
+from main.utils import ANSWER_STREAM_TAG
+from utils.resources import get_langgraph_flow, get_service_qa_chain
+
+# Asyncio entry point: `uvicorn asgi:app`. /query and /query/stream run end to end on the
+# event loop (async graph nodes, LLM, embedding and Redis calls); every other route is
+# served by the Flask app mounted below.
+app = FastAPI(title="CopBot Chat API")
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+flask_app = create_app()
+
+async def _prepare_query(request):
+    data = await request.json()
+    user_id = data.get("user_id")
+    email = data.get("email")
+    query = data.get("query", "").strip()
+    print("📥 Incoming (async):", data)
+
+    language = "en"
+    query_translated = query
+    if user_id and email and query:
+        try:
+            language = await detect_language(query)
+        except Exception as e:
+            print(f"❌ Language detection failed: {e}")
+            language = "en"
+        if language in ["ta", "hi"]:
+            query_translated = await translate_text(query, target_lang="en")
+
+    return user_id, email, query, query_translated, language
+
+@app.post("/query")
+async def query_chatbot(request: Request):
+    """Async /query: same request and response as the Flask route in background follow-up mode."""
+    try:
+        user_id, email, query, query_translated, language = await _prepare_query(request)
+
+        if not user_id or not email:
+            return JSONResponse({"error": "User ID and email are required"}, status_code=400)
+        if not query:
+            return JSONResponse({"email": email})
+
+        try:
+            result = await get_langgraph_flow().ainvoke(GraphState({"query": query_translated, "email": email}))
+            formatted_answer = make_links_clickable(result.get("response", "Sorry, I couldn't find an answer."))
+        except Exception as e:
+            print(f"⚠️ LangGraph failed, falling back to LangChain: {e}")
+            result = await get_service_qa_chain().ainvoke({"query": query_translated})
+            formatted_answer = make_links_clickable(result["result"])
+
+        if language in ["ta", "hi"]:
+            formatted_answer = await translate_text(formatted_answer, target_lang=language)
+
+        source_documents = result.get("source_documents") or []
+        followups_id = await asubmit_followups(
+            email, query, formatted_answer, [doc.page_content for doc in source_documents], afollowup_translator(language)
+        )
+        return JSONResponse({
+            "email": email,
+            "answer": formatted_answer,
+            "followups": [],
+            "followups_id": followups_id
+        })
+
+    except Exception as e:
+        print(f"❌ Error processing query: {e}")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+@app.post("/query/stream")
+async def query_chatbot_stream(request: Request):
+    """Async /query/stream: emits the same Server-Sent Events as the Flask route."""
+    user_id, email, query, query_translated, language = await _prepare_query(request)
+
+    if not user_id or not email:
+        return JSONResponse({"error": "User ID and email are required"}, status_code=400)
+    if not query:
+        return JSONResponse({"email": email})
+
+    async def generate():
+        result = None
+        try:
+            async for mode, chunk in get_langgraph_flow().astream(
+                GraphState({"query": query_translated, "email": email}), stream_mode=["messages", "values"]
+            ):
+                if mode == "values":
+                    result = chunk
+                    continue
+                message, metadata = chunk
+                if language == "en" and message.content and ANSWER_STREAM_TAG in metadata.get("tags", []):
+                    yield sse_event("token", {"text": message.content})
+            answer = result.get("response", "Sorry, I couldn't find an answer.")
+        except Exception as e:
+            print(f"⚠️ LangGraph failed, falling back to LangChain: {e}")
+            try:
+                result = await get_service_qa_chain().ainvoke({"query": query_translated})
+                answer = result["result"]
+            except Exception as e:
+                print(f"❌ Error processing query: {e}")
+                yield sse_event("error", {"error": str(e)})
+                yield sse_event("done", {})
+                return
+
+        formatted_answer = make_links_clickable(answer)
+        if language in ["ta", "hi"]:
+            formatted_answer = await translate_text(formatted_answer, target_lang=language)
+        yield sse_event("answer", {"email": email, "answer": formatted_answer})
+        yield sse_event("metadata", {
+            "intent": result.get("intent"),
+            "escalate": bool(result.get("escalate")),
+            "awaiting_details": bool(result.get("awaiting_details"))
+        })
+
+        source_documents = result.get("source_documents") or []
+        followups_id = await asubmit_followups(
+            email, query, formatted_answer, [doc.page_content for doc in source_documents], afollowup_translator(language)
+        )
+        job = await await_followup_job(followups_id, timeout=STREAM_FOLLOWUP_TIMEOUT)
+        yield sse_event("followups", {"followups_id": followups_id, "followups": job["followups"] if job else []})
+        yield sse_event("done", {})
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Remaining routes (/signin, /followups/<id>, /stats/...) are served by the Flask app
+app.mount("/", WSGIMiddleware(flask_app))
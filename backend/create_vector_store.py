@@ -1,43 +1,82 @@
 # create_vector_store.py
 import time
 import os
+import json
+import queue
 import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from langchain_core.documents import Document
 from langchain_community.document_loaders import PyPDFLoader, CSVLoader, Docx2txtLoader, UnstructuredExcelLoader, TextLoader
 from langchain_community.vectorstores import Pinecone as PineconeVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from utils.embedding_cache import get_embeddings
 from pinecone import Pinecone,ServerlessSpec
-from agentic_chunker import AgenticChunker
+from agentic_chunker import AgenticChunker, chunk_texts_parallel
+from utils.ingest_config import (
+    EMBEDDING_BATCH_SIZE, TABULAR_QA_INGESTION, CHUNKING_WORKERS, GEMINI_REQUESTS_PER_MINUTE, get_chunker_options
+)
+from utils.request_budget import RequestBudget
+from utils.dedup import NearDuplicateFilter
+from utils.local_vector_store import VECTOR_STORE_BACKEND, LocalVectorStore
+from utils.lexical_index import init_lexical_index, add_chunks, delete_chunks, lexical_gaps
+from utils.qa_loader import load_qa_csv
+from database.checkpoint_store import (
+    init_checkpoint_db, clear_checkpoint, document_key, load_document_chunks, save_document_chunks,
+    upserted_vector_ids, mark_vectors_upserted, forget_upserted_vectors
+)
+from database.ingest_manifest import (
+    INGEST_DATA_DIR, init_manifest_db, get_manifest, plan_ingestion, record_file, remove_file, vector_id
+)
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 100))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", 4))  # Upsert batches in flight at once
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", 5))
+UPSERT_RETRY_BASE_DELAY = float(os.getenv("UPSERT_RETRY_BASE_DELAY", 2))  # Seconds, doubled on every retry
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 64))  # Items buffered between ingestion stages
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "True") == "True"  # Drop near-duplicate chunks before embedding
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.8))  # Estimated Jaccard similarity of word shingles
+DEDUP_REPORT_PATH = os.getenv("DEDUP_REPORT_PATH", "dedup_report.json")
+SUPPORTED_EXTENSIONS = {".pdf", ".csv", ".docx", ".doc", ".xlsx", ".xls", ".txt"}
 
-def agentic_chunking(text: str) -> list:
-    ac = AgenticChunker()
+def agentic_chunking(text: str, request_budget: RequestBudget = None) -> list:
+    ac = AgenticChunker(request_budget=request_budget, **get_chunker_options())
     ac.chunk(text)
     chunks=ac.get_chunks(get_type='list_of_strings')
     print(chunks)
     return chunks
      
-def load_documents(directory: str) -> list:
-    """ Load documents from the specified directory. """
+def list_source_files(directory: str) -> list:
+    """ List the supported files in the specified directory. """
     if not os.path.exists(directory):
-        print(f"❌ Dataset directory does not exist: {directory}")
         return []
-    
-    supported_extensions = {".pdf", ".csv", ".docx", ".doc", ".xlsx", ".xls", ".txt"}
-    documents = []
+    return [
+        os.path.join(directory, file) for file in os.listdir(directory)
+        if os.path.splitext(file)[1].lower() in SUPPORTED_EXTENSIONS
+    ]
+
+def iter_documents(directory: str, sources: set = None):
+    """ Yield documents from the specified directory one file at a time, optionally only the given file paths. """
+    if not os.path.exists(directory):
+        print(f"❌ Dataset directory does not exist: {directory}")
+        return
     
     for file in os.listdir(directory):
         file_path = os.path.join(directory, file)
         ext = os.path.splitext(file)[1].lower()
-        if ext not in supported_extensions:
+        if ext not in SUPPORTED_EXTENSIONS:
             print(f"⚠️ Skipping unsupported file: {file}")
             continue  
+        if sources is not None and file_path not in sources:
+            continue
         
         try:
             if ext == ".pdf":
                 loader = PyPDFLoader(file_path)
+            elif ext == ".csv" and TABULAR_QA_INGESTION:
+                yield from load_qa_csv(file_path)
+                continue
             elif ext == ".csv":
                 loader = CSVLoader(file_path)
             elif ext in [".doc", ".docx"]:
@@ -49,59 +88,192 @@ def load_documents(directory: str) -> list:
             else:
                 continue  
             
-            documents.extend(loader.load())  
+            yield from loader.lazy_load()
 
         except Exception as e:
             print(f"❌ Error loading {file}: {e}")
-    
+
+def load_documents(directory: str, sources: set = None) -> list:
+    """ Load documents from the specified directory, optionally only the given file paths. """
+    documents = list(iter_documents(directory, sources))
     if not documents:
         print("❌ No valid documents loaded. Ensure files are supported.")
         return []
     
     return documents
 
-def chunk_documents(documents: list) -> list:
-    """ Chunk the loaded documents. """
+def chunk_documents(documents: list, workers: int = CHUNKING_WORKERS) -> list:
+    """ Chunk the loaded documents, reusing chunks saved by an earlier run. """
+    return list(iter_chunks(documents, workers))
+
+def iter_chunks(documents, workers: int = CHUNKING_WORKERS, failed_sources: set = None):
+    """
+    Yield chunked Documents as each document finishes, reusing chunks saved by an earlier run.
+    Documents whose chunking fails are skipped and their source is added to `failed_sources`.
+    """
+    if failed_sources is None:
+        failed_sources = set()
+    if workers <= 1:
+        # One budget across documents: only real LLM calls are charged, cached responses pass straight through
+        request_budget = RequestBudget(GEMINI_REQUESTS_PER_MINUTE, period=60)
+        for doc in documents:
+            if doc.metadata.get("content_type") == "qa_pair":
+                yield doc  # Q&A rows are already one chunk each
+                continue
+            saved_chunks = load_document_chunks(document_key(doc))
+            if saved_chunks is not None:
+                print(f"⏩ Resuming: {doc.metadata.get('source')} already chunked ({len(saved_chunks)} chunks).")
+                yield from saved_chunks
+                continue
+            try:
+                chunk_texts = agentic_chunking(doc.page_content, request_budget)
+            except Exception as e:
+                print(f"❌ Skipping {doc.metadata.get('source')}: chunking failed: {e}")
+                failed_sources.add(doc.metadata.get("source"))
+                continue
+            yield from save_chunks(doc, chunk_texts)
+        return
+
+    in_flight, ready = {}, []
+    next_position = 0  # Matches the position chunk_texts_parallel gives each text it pulls
+
+    def unchunked_texts():
+        nonlocal next_position
+        for doc in documents:
+            if doc.metadata.get("content_type") == "qa_pair":
+                ready.append([doc])
+                continue
+            saved_chunks = load_document_chunks(document_key(doc))
+            if saved_chunks is not None:
+                print(f"⏩ Resuming: {doc.metadata.get('source')} already chunked ({len(saved_chunks)} chunks).")
+                ready.append(saved_chunks)
+                continue
+            in_flight[next_position] = doc
+            next_position += 1
+            yield doc.page_content
+
+    for position, chunk_texts in chunk_texts_parallel(
+        unchunked_texts(), workers, GEMINI_REQUESTS_PER_MINUTE,
+        **get_chunker_options()
+    ):
+        while ready:
+            yield from ready.pop(0)
+        doc = in_flight.pop(position)
+        if chunk_texts is None:
+            print(f"❌ Skipping {doc.metadata.get('source')}: chunking failed.")
+            failed_sources.add(doc.metadata.get("source"))
+            continue
+        yield from save_chunks(doc, chunk_texts)
+    while ready:
+        yield from ready.pop(0)
+
+def save_chunks(doc: Document, chunk_texts: list) -> list:
+    """ Wrap a document's chunk texts as Documents and checkpoint them. """
+    document_chunks = [Document(page_content=text, metadata=doc.metadata) for text in chunk_texts]
+    save_document_chunks(document_key(doc), document_chunks)
+    return document_chunks
+
+def prepare_pinecone_index():
+    """ Create the Pinecone index if needed and return a vector store over it. """
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    existing_indexes = pc.list_indexes().names()
     
-    chunked_documents = []
-    for doc in documents:
-        agentic_chunker = AgenticChunker()  
-        doc_chunks = agentic_chunker.chunk(doc.page_content)
-        
-        for chunk_id, chunk_data in doc_chunks.items():
-            chunk_text = " ".join(chunk_data["propositions"])
-            chunked_documents.append(Document(page_content=chunk_text, metadata=doc.metadata))
+    if PINECONE_INDEX_NAME not in existing_indexes:
+        print(f"Creating new Pinecone index: {PINECONE_INDEX_NAME}")
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            dimension=768,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+    
+    while True:
+        index_info = pc.describe_index(PINECONE_INDEX_NAME)
+        if index_info.status["ready"]:
+            break
+    print(f"Pinecone index '{PINECONE_INDEX_NAME}' is ready.")
+    
+    embeddings = get_embeddings()
+    return PineconeVectorStore.from_existing_index(
+        index_name=PINECONE_INDEX_NAME,
+        embedding=embeddings
+    )
+
+def prepare_vector_store():
+    """ Return the vector store ingestion writes to, on the backend chosen by VECTOR_STORE_BACKEND. """
+    if VECTOR_STORE_BACKEND == "local":
+        print(f"Using local vector store for '{PINECONE_INDEX_NAME}'.")
+        return LocalVectorStore.load(PINECONE_INDEX_NAME, get_embeddings())
+    return prepare_pinecone_index()
 
-        time.sleep(60)
-    return chunked_documents
+def _upsert_batch(vector_store, batch_number: int, batch: list):
+    """ Embed and upsert one batch of (chunk, vector_id) pairs, retrying with exponential backoff. """
+    done = upserted_vector_ids([chunk_id for _, chunk_id in batch], PINECONE_INDEX_NAME)
+    pending = [(chunk, chunk_id) for chunk, chunk_id in batch if chunk_id not in done]
+    if not pending:
+        print(f"⏩ Resuming: batch {batch_number} already upserted.")
+        add_chunks(PINECONE_INDEX_NAME, batch)  # The keyword index may not have it yet
+        return
+    if done:
+        print(f"⏩ Resuming: {len(batch) - len(pending)} chunks of batch {batch_number} already upserted.")
+    chunks = [chunk for chunk, _ in pending]
+    ids = [chunk_id for _, chunk_id in pending]
+
+    for attempt in range(UPSERT_MAX_RETRIES + 1):
+        try:
+            vector_store.add_documents(chunks, ids=ids, embedding_chunk_size=EMBEDDING_BATCH_SIZE)
+            break
+        except Exception as e:
+            if attempt == UPSERT_MAX_RETRIES:
+                raise
+            delay = UPSERT_RETRY_BASE_DELAY * 2 ** attempt
+            print(f"⚠️ Upsert of batch {batch_number} failed ({e}). Retrying in {delay:.0f} seconds...")
+            time.sleep(delay)
+
+    add_chunks(PINECONE_INDEX_NAME, batch)  # Keyword index for hybrid retrieval
+    mark_vectors_upserted(ids, PINECONE_INDEX_NAME)
+    print(f"⬆️ Upserted batch {batch_number} ({len(chunks)} chunks).")
+
+def _landed_batches(done, in_flight):
+    for future in done:
+        batch = in_flight.pop(future)
+        future.result()
+        yield from batch
+
+def upsert_batches(vector_store, chunks_with_ids, concurrency: int = UPSERT_CONCURRENCY):
+    """
+    Embed and upsert (chunk, vector_id) pairs in batches of UPSERT_BATCH_SIZE, with up to
+    `concurrency` batches in flight. Chunks recorded in the checkpoint as upserted are skipped.
+    Yields each pair once its batch has landed.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+        batch_number = 0
+        batch = []
+        for pair in chunks_with_ids:
+            batch.append(pair)
+            if len(batch) < UPSERT_BATCH_SIZE:
+                continue
+            batch_number += 1
+            in_flight[pool.submit(_upsert_batch, vector_store, batch_number, batch)] = batch
+            batch = []
+            if len(in_flight) >= concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from _landed_batches(done, in_flight)
+        if batch:
+            batch_number += 1
+            in_flight[pool.submit(_upsert_batch, vector_store, batch_number, batch)] = batch
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from _landed_batches(done, in_flight)
 
 def create_pinecone_vector_store(chunked_documents: list):
     """ Create Pinecone vector store from chunked documents. """
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        existing_indexes = pc.list_indexes().names()
-        
-        if PINECONE_INDEX_NAME not in existing_indexes:
-            print(f"Creating new Pinecone index: {PINECONE_INDEX_NAME}")
-            pc.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=768,
-                metric="cosine",
-                spec=ServerlessSpec(cloud="aws", region="us-east-1")
-            )
-        
-        while True:
-            index_info = pc.describe_index(PINECONE_INDEX_NAME)
-            if index_info.status["ready"]:
-                break
-        print(f"Pinecone index '{PINECONE_INDEX_NAME}' is ready.")
-        
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        vector_store = PineconeVectorStore.from_documents(
-            documents=chunked_documents,
-            embedding=embeddings,
-            index_name=PINECONE_INDEX_NAME
-        )
+        vector_store = prepare_vector_store()
+        ids = [vector_id(chunk) for chunk in chunked_documents]
+        for _ in upsert_batches(vector_store, zip(chunked_documents, ids)):
+            pass
         print(f"Successfully added {len(chunked_documents)} documents to Pinecone.")
         
         return vector_store
@@ -110,17 +282,195 @@ def create_pinecone_vector_store(chunked_documents: list):
         print(f"Error creating Pinecone vector store: {e}")
         return None
 
-def main():
-    # Get the directory of the current script
-    script_directory = os.path.dirname(os.path.abspath(__file__))
+_STAGE_DONE = object()
+
+def _drain(inbox):
+    while True:
+        item = inbox.get()
+        if item is _STAGE_DONE:
+            return
+        yield item
+
+def _run_stage(work, inbox, outbox, errors):
+    """ Run one pipeline stage over the items in inbox, passing its output on to outbox. """
+    items = _drain(inbox) if inbox is not None else None
+    try:
+        for item in work(items):
+            if errors:
+                break  # Another stage failed, stop doing expensive work
+            if outbox is not None:
+                outbox.put(item)
+    except Exception as e:
+        print(f"❌ Ingestion stage '{work.__name__}' failed: {e}")
+        errors.append(e)
+    finally:
+        if items is not None:
+            for _ in items:
+                pass  # Keep the upstream stage from blocking on a full queue
+        if outbox is not None:
+            outbox.put(_STAGE_DONE)
+
+def run_ingestion_pipeline(documents, vector_store, dedup_filter=None, queue_size: int = PIPELINE_QUEUE_SIZE) -> tuple:
+    """
+    Stream documents through load -> chunk -> dedup -> embed/upsert stages running in their own threads.
+    Bounded queues between stages apply back-pressure, so upserts overlap with chunking and
+    memory stays flat regardless of corpus size.
+    Returns (loaded_sources, ids_by_source, duplicates_by_source, failed_sources) and raises the first stage
+    error, if any. duplicates_by_source lists, per source, the canonical vector IDs of other sources its dropped
+    chunks duplicate; failed_sources holds the sources with at least one document that could not be chunked.
+    """
+    document_queue = queue.Queue(maxsize=queue_size)
+    chunk_queue = queue.Queue(maxsize=queue_size)
+    unique_queue = queue.Queue(maxsize=queue_size)
+    errors = []
+    loaded_sources = set()
+    ids_by_source = {}
+    duplicates_by_source = {}
+    canonical_sources = {}
+    failed_sources = set()
+
+    def load(_):
+        for doc in documents:
+            loaded_sources.add(doc.metadata.get("source"))
+            yield doc
+
+    def chunk(docs):
+        for chunk_doc in iter_chunks(docs, failed_sources=failed_sources):
+            yield chunk_doc, vector_id(chunk_doc)
+
+    def dedup(chunks_with_ids):
+        for chunk_doc, chunk_id in chunks_with_ids:
+            source = chunk_doc.metadata.get("source")
+            canonical_id = dedup_filter.add(chunk_id, chunk_doc.page_content, source) if dedup_filter else None
+            if canonical_id is None:
+                canonical_sources[chunk_id] = source
+                yield chunk_doc, chunk_id
+            elif canonical_sources[canonical_id] != source:
+                duplicates_by_source.setdefault(source, []).append(canonical_id)
+
+    def upsert(chunks_with_ids):
+        for chunk_doc, chunk_id in upsert_batches(vector_store, chunks_with_ids):
+            ids_by_source.setdefault(chunk_doc.metadata.get("source"), []).append(chunk_id)
+            yield chunk_id
+
+    stages = [
+        threading.Thread(target=_run_stage, args=(load, None, document_queue, errors), daemon=True),
+        threading.Thread(target=_run_stage, args=(chunk, document_queue, chunk_queue, errors), daemon=True),
+        threading.Thread(target=_run_stage, args=(dedup, chunk_queue, unique_queue, errors), daemon=True),
+        threading.Thread(target=_run_stage, args=(upsert, unique_queue, None, errors), daemon=True),
+    ]
+    for stage in stages:
+        stage.start()
+    for stage in stages:
+        stage.join()
+
+    if errors:
+        raise errors[0]
+    return loaded_sources, ids_by_source, duplicates_by_source, failed_sources
+
+def apply_dedup_results(dedup_filter: NearDuplicateFilter):
+    """ Record merged sources on canonical vectors and write the dedup report. """
+    merged = dedup_filter.merged_sources()
+    if merged and VECTOR_STORE_BACKEND == "local":
+        LocalVectorStore.load(PINECONE_INDEX_NAME).update_metadata(
+            {canonical_id: {"sources": sources} for canonical_id, sources in merged.items()}
+        )
+    elif merged:
+        index = Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME)
+        for canonical_id, sources in merged.items():
+            index.update(id=canonical_id, set_metadata={"sources": sources})
+
+    report = dedup_filter.report()
+    print(
+        f"🧬 Dedup: {report['chunks_seen']} chunks seen, {report['duplicates_dropped']} near-duplicates dropped "
+        f"across {len(report['groups'])} groups."
+    )
+    if DEDUP_REPORT_PATH:
+        with open(DEDUP_REPORT_PATH, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"🧬 Dedup report written to {DEDUP_REPORT_PATH}")
+
+def delete_vectors(vector_ids: list):
+    """ Delete vectors from the index by ID. """
+    forget_upserted_vectors(vector_ids, PINECONE_INDEX_NAME)
+    delete_chunks(PINECONE_INDEX_NAME, vector_ids)
+    if VECTOR_STORE_BACKEND == "local":
+        LocalVectorStore.load(PINECONE_INDEX_NAME).delete(vector_ids)
+        return
+    index = Pinecone(api_key=PINECONE_API_KEY).Index(PINECONE_INDEX_NAME)
+    for start in range(0, len(vector_ids), 1000):
+        index.delete(ids=vector_ids[start:start + 1000])
+
+def main(resume=True):
+    init_checkpoint_db()
+    init_manifest_db()
+    init_lexical_index()
+    if not resume:
+        clear_checkpoint()
+
+    # Dataset directory next to this script unless INGEST_DATA_DIR points elsewhere; vector IDs are relative to it
+    dataset_path = INGEST_DATA_DIR
+
+    # Only new or modified files are re-ingested; vectors of deleted files are removed up front,
+    # those of modified files once the new version has landed
+    source_files = list_source_files(dataset_path)
+    changed, deleted = plan_ingestion(source_files, PINECONE_INDEX_NAME)
+    print(f"📋 {len(changed)} new or modified files, {len(deleted)} files with stale vectors.")
+
+    # Unchanged files missing from the keyword index (ingested before it existed) go through the pipeline
+    # again; saved chunks and the embedding cache normally spare them the LLM and embedding calls
+    manifest = get_manifest(PINECONE_INDEX_NAME)
+    backfill = [
+        source for source in lexical_gaps(PINECONE_INDEX_NAME, manifest)
+        if source in source_files and source not in changed
+    ]
+    for source in backfill:
+        changed[source] = manifest[source][0]
+        deleted[source] = manifest[source][1]
+    if backfill:
+        print(f"📋 {len(backfill)} files to add to the keyword index.")
+    for source, vector_ids in deleted.items():
+        if source in changed:
+            continue
+        if vector_ids:
+            delete_vectors(vector_ids)
+        remove_file(source, PINECONE_INDEX_NAME)
+        print(f"🗑️ Removed {len(vector_ids)} vectors for deleted file: {source}")
+    if not changed:
+        print("✅ Knowledge base is up to date.")
+        return
 
-    # Define the dataset path relative to the script's directory
-    dataset_path = os.path.join(script_directory, "Dataset")
-    documents = load_documents(dataset_path)
-    chunked_documents = chunk_documents(documents)
-    vector_store = create_pinecone_vector_store(chunked_documents)
+    dedup_filter = NearDuplicateFilter(threshold=DEDUP_THRESHOLD) if DEDUP_ENABLED else None
+    try:
+        vector_store = prepare_vector_store()
+        loaded_sources, ids_by_source, duplicates_by_source, failed_sources = run_ingestion_pipeline(
+            iter_documents(dataset_path, sources=set(changed)),
+            vector_store,
+            dedup_filter
+        )
+        if dedup_filter:
+            apply_dedup_results(dedup_filter)
+    except Exception as e:
+        print(f"Error creating Pinecone vector store: {e}")
+        return
+
+    upserted = sum(len(ids) for ids in ids_by_source.values())
+    print(f"Successfully added {upserted} documents to Pinecone.")
+    for source in loaded_sources:
+        if source in failed_sources:
+            # Keep the old hash and vectors so the next run retries the whole file
+            print(f"⚠️ Not recording {source}: some of its documents failed to chunk.")
+            continue
+        vector_ids = list(dict.fromkeys(ids_by_source.get(source, [])))
+        stale_ids = set(deleted.get(source, [])) - set(vector_ids)
+        if stale_ids:
+            delete_vectors(list(stale_ids))
+        record_file(
+            source, changed[source], vector_ids, PINECONE_INDEX_NAME,
+            duplicate_of=list(dict.fromkeys(duplicates_by_source.get(source, [])))
+        )
 
 if __name__ == "__main__":
-    main()
+    main(resume=os.getenv("INGEST_RESUME", "True") == "True")
 
 
@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import sqlite3
+from langchain_core.documents import Document
+
+CHECKPOINT_DB_PATH = os.getenv("INGEST_CHECKPOINT_PATH", "ingest_checkpoint.db")
+
+def init_checkpoint_db():
+    """Create the ingestion checkpoint tables if they don't exist."""
+    with sqlite3.connect(CHECKPOINT_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chunked_documents (
+                doc_key TEXT PRIMARY KEY,
+                chunks TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS upserted_vectors (
+                vector_id TEXT NOT NULL,
+                index_name TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (vector_id, index_name)
+            )
+        """)
+        conn.commit()
+
+def clear_checkpoint():
+    """Forget all chunking and upsert progress so the next run starts from scratch."""
+    init_checkpoint_db()
+    with sqlite3.connect(CHECKPOINT_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM chunked_documents")
+        cursor.execute("DELETE FROM upserted_vectors")
+        conn.commit()
+    print("🧹 Ingestion checkpoint cleared.")
+
+def document_key(doc):
+    """Key a loaded document by its source metadata and content."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(doc.metadata, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(doc.page_content.encode("utf-8"))
+    return digest.hexdigest()
+
+def load_document_chunks(doc_key):
+    """Return the saved chunks for a document, or None if it was never chunked."""
+    with sqlite3.connect(CHECKPOINT_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT chunks FROM chunked_documents WHERE doc_key = ?", (doc_key,))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return [Document(page_content=c["page_content"], metadata=c["metadata"]) for c in json.loads(row[0])]
+
+def save_document_chunks(doc_key, chunks):
+    """Persist the chunks produced for one document."""
+    payload = json.dumps([{"page_content": c.page_content, "metadata": c.metadata} for c in chunks], default=str)
+    with sqlite3.connect(CHECKPOINT_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO chunked_documents (doc_key, chunks)
+            VALUES (?, ?)
+        """, (doc_key, payload))
+        conn.commit()
+
+def upserted_vector_ids(vector_ids, index_name):
+    """
+    The subset of `vector_ids` already upserted into an index. Progress is kept per vector,
+    so a resumed run skips them however its batches are laid out.
+    """
+    vector_ids = list(vector_ids)
+    found = set()
+    with sqlite3.connect(CHECKPOINT_DB_PATH) as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(vector_ids), 500):
+            part = vector_ids[start:start + 500]
+            cursor.execute(
+                f"SELECT vector_id FROM upserted_vectors WHERE index_name = ? AND vector_id IN ({', '.join('?' * len(part))})",
+                (index_name, *part)
+            )
+            found.update(row[0] for row in cursor.fetchall())
+    return found
+
+def mark_vectors_upserted(vector_ids, index_name):
+    with sqlite3.connect(CHECKPOINT_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT OR REPLACE INTO upserted_vectors (vector_id, index_name)
+            VALUES (?, ?)
+        """, [(vector_id, index_name) for vector_id in vector_ids])
+        conn.commit()
+
+def forget_upserted_vectors(vector_ids, index_name):
+    """Drop deleted vectors from the checkpoint so the same content is upserted again if it comes back."""
+    with sqlite3.connect(CHECKPOINT_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "DELETE FROM upserted_vectors WHERE vector_id = ? AND index_name = ?",
+            [(vector_id, index_name) for vector_id in vector_ids]
+        )
+        conn.commit()
@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+MANIFEST_DB_PATH = os.getenv("INGEST_MANIFEST_PATH", "ingest_manifest.db")
+INGEST_DATA_DIR = os.getenv(
+    "INGEST_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Dataset")
+)
+
+def init_manifest_db():
+    """Create the ingestion manifest table if it doesn't exist."""
+    with sqlite3.connect(MANIFEST_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ingested_files (
+                source TEXT NOT NULL,
+                index_name TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                vector_ids TEXT NOT NULL,
+                duplicate_of TEXT NOT NULL DEFAULT '[]',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (source, index_name)
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS index_versions (
+                index_name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+        """)
+        conn.commit()
+
+def file_hash(path):
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def vector_id(chunk, root=INGEST_DATA_DIR):
+    """
+    Deterministic vector ID from a chunk's source path and content, so re-upserts overwrite instead of duplicating.
+    The path is taken relative to `root`, so moving the checkout or mounting it elsewhere keeps the same IDs.
+    """
+    source = chunk.metadata.get("source")
+    if source is not None and root:
+        source = os.path.relpath(os.path.abspath(source), os.path.abspath(root)).replace(os.sep, "/")
+    digest = hashlib.sha256()
+    digest.update(str(source).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(chunk.page_content.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+def get_manifest(index_name):
+    """
+    Return {source: (content_hash, vector_ids, duplicate_of)} for everything ingested into an index.
+    duplicate_of holds the vector IDs of other files' chunks that stand in for this file's dropped duplicates.
+    """
+    with sqlite3.connect(MANIFEST_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT source, content_hash, vector_ids, duplicate_of FROM ingested_files WHERE index_name = ?",
+            (index_name,)
+        )
+        return {
+            source: (content_hash, json.loads(ids), json.loads(duplicate_of))
+            for source, content_hash, ids, duplicate_of in cursor.fetchall()
+        }
+
+def plan_ingestion(paths, index_name):
+    """
+    Compare the files on disk with the manifest.
+    Returns (changed, deleted): changed maps each new or modified path to its
+    content hash, deleted maps each path that is gone to its stale vector IDs.
+    Vector IDs of modified files are included in deleted as well.
+    Unchanged files whose dropped duplicates point at vectors that may go away
+    are re-ingested too, so their content is not lost.
+    """
+    manifest = get_manifest(index_name)
+    present = set(paths)
+    hashes = {path: file_hash(path) for path in paths}
+    changed, deleted = {}, {}
+    for path in paths:
+        previous = manifest.get(path)
+        if previous is None or previous[0] != hashes[path]:
+            changed[path] = hashes[path]
+            if previous is not None:
+                deleted[path] = previous[1]
+    for source, (_, vector_ids, _) in manifest.items():
+        if source not in present:
+            deleted[source] = vector_ids
+
+    stale_ids = {vector_id for vector_ids in deleted.values() for vector_id in vector_ids}
+    for path in paths:
+        previous = manifest.get(path)
+        if path not in changed and previous is not None and stale_ids.intersection(previous[2]):
+            changed[path] = hashes[path]
+            deleted[path] = previous[1]
+    return changed, deleted
+
+def _bump_index_version(cursor, index_name):
+    cursor.execute("""
+        INSERT INTO index_versions (index_name, version) VALUES (?, 1)
+        ON CONFLICT(index_name) DO UPDATE SET version = version + 1
+    """, (index_name,))
+
+def get_index_version(index_name):
+    """
+    Counter that changes whenever files are ingested into or removed from an index,
+    so caches of answers drawn from the index can tell they are stale. 0 if unknown.
+    """
+    if not os.path.exists(MANIFEST_DB_PATH):
+        return 0
+    try:
+        with sqlite3.connect(MANIFEST_DB_PATH) as conn:
+            row = conn.execute("SELECT version FROM index_versions WHERE index_name = ?", (index_name,)).fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+def record_file(source, content_hash, vector_ids, index_name, duplicate_of=()):
+    """Record that a file version was ingested along with the vectors it produced."""
+    with sqlite3.connect(MANIFEST_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO ingested_files (source, index_name, content_hash, vector_ids, duplicate_of)
+            VALUES (?, ?, ?, ?, ?)
+        """, (source, index_name, content_hash, json.dumps(vector_ids), json.dumps(list(duplicate_of))))
+        _bump_index_version(cursor, index_name)
+        conn.commit()
+
+def remove_file(source, index_name):
+    with sqlite3.connect(MANIFEST_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM ingested_files WHERE source = ? AND index_name = ?",
+            (source, index_name)
+        )
+        _bump_index_version(cursor, index_name)
+        conn.commit()
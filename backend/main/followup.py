@@ -1,20 +1,29 @@
 import redis
-from pinecone import Pinecone
+import redis.asyncio as aioredis
 import google.generativeai as genai
 import json
 import os
+import asyncio
+import uuid
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from utils.embedding_cache import get_embedding_memo
+from utils.resources import get_search_index
 
 # Load environment variables from .env
 load_dotenv()
 
 # Retrieve API keys and settings from .env
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GEMINI_API_KEY1 = os.getenv("GEMINI_API_KEY1")
 REDIS_HOST = os.getenv("REDIS_CLOUD_HOST")
 REDIS_PORT = int(os.getenv("REDIS_CLOUD_PORT", 6379))
 REDIS_PASSWORD = os.getenv("REDIS_CLOUD_PASSWORD")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+FOLLOWUP_WORKERS = int(os.getenv("FOLLOWUP_WORKERS", 4))  # Background follow-up jobs run at once
+FOLLOWUP_RESULT_TTL = int(os.getenv("FOLLOWUP_RESULT_TTL", 600))  # Seconds a finished job stays pollable
 
 print(f"Connecting to Redis at {REDIS_HOST}:{REDIS_PORT}")
 # Initialize Redis Cloud connection
@@ -31,35 +40,53 @@ try:
 except redis.ConnectionError as e:
     print(f"❌ Failed to connect to Redis Cloud: {e}")
 
-# Initialize Pinecone
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index = pc.Index(INDEX_NAME)
+# Async client for the asyncio request path; connects lazily on first use
+async_redis_client = aioredis.StrictRedis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    decode_responses=True
+)
 
 # Initialize Google Gemini API
 genai.configure(api_key=GEMINI_API_KEY1)
 
-def store_conversation_redis(email, query, response):
+# Follow-ups are generated off the request path; jobs for one user run in order
+followup_executor = ThreadPoolExecutor(max_workers=FOLLOWUP_WORKERS)
+_user_queues = {}  # email -> jobs waiting behind the one running, dropped once drained
+_user_queues_guard = threading.Lock()
+
+def store_conversation_redis(email, query, response, context=None):
     """
     Stores the latest query and response in Redis.
     Maintains only the last three conversations per chat.
+    `context` holds the texts retrieved to answer the query, so follow-up
+    generation can reuse them instead of searching the index again.
     """
     key = f"chat:{email}:history"
 
     # Retrieve existing conversations
     conversations = redis_client.lrange(key, 0, 2)  # Get up to last three
-    conversations = [json.loads(conv) for conv in conversations]
+    conversations = _append_conversation(conversations, query, response, context)
+
+    # Store back in Redis
+    redis_client.delete(key)  # Clear old entries
+    for conv in conversations:
+        redis_client.rpush(key, json.dumps(conv))  # Push latest data
+
+def _append_conversation(stored, query, response, context):
+    conversations = [json.loads(conv) for conv in stored]
 
     # Append new query-response pair
-    conversations.append({"query": query, "response": response})
+    conversation = {"query": query, "response": response}
+    if context:
+        conversation["context"] = context
+    conversations.append(conversation)
 
     # Keep only the last 3 conversations
     if len(conversations) > 3:
         conversations.pop(0)
-
-    # Store back in Redis
-    redis_client.delete(key)  # Clear old entries
-    for conv in conversations:
-        redis_client.rpush(key, json.dumps(conv))  # Push latest data
+    return conversations
 
 def get_last_three_conversations(email):
     """
@@ -74,27 +101,52 @@ def get_last_three_conversations(email):
 
     return [json.loads(conv) for conv in conversations]
 
+def get_embeddings_batch(texts):
+    """
+    Generates embeddings for several texts using Google Gemini, in one request for the texts not memoized yet.
+    """
+    embedding_model = "models/embedding-001"  # Correct model path
+
+    def compute(missing):
+        response = genai.embed_content(model=embedding_model, content=missing, task_type="retrieval_query")
+        return response["embedding"]
+
+    cache = get_embedding_memo()
+    if cache is not None:
+        return cache.get_or_compute(embedding_model, "retrieval_query", texts, compute)
+    return compute(texts)
+
 def get_embedding(text):
     """
     Generates an embedding for a given text using Google Gemini.
     """
-    embedding_model = "models/embedding-001"  # Correct model path
-    response = genai.embed_content(model=embedding_model, content=text, task_type="retrieval_query")
-    return response["embedding"]  # Extract the embedding from the response
+    return get_embeddings_batch([text])[0]
 
 def get_relevant_context(conversations):
     """
-    Searches Pinecone for relevant context based on the last three queries.
+    Collects relevant context for the last three queries.
+    Conversations stored with the documents retrieved to answer them reuse those;
+    the rest are embedded in one batch and searched in the index concurrently.
     """
-    context_list = []
-
-    for conversation in conversations:
-        query_embedding = get_embedding(conversation["query"])  # Convert query to vector
-        results = index.query(vector=query_embedding, top_k=3, include_metadata=True)  # Fetch best matches
+    missing = [conversation for conversation in conversations if not conversation.get("context")]
+    looked_up = {}
+    if missing:
+        index = get_search_index(INDEX_NAME)
+        query_embeddings = get_embeddings_batch([conversation["query"] for conversation in missing])
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            results = pool.map(
+                lambda vector: index.query(vector=vector, top_k=3, include_metadata=True),  # Fetch best matches
+                query_embeddings
+            )
+            for conversation, result in zip(missing, results):
+                looked_up[id(conversation)] = [match["metadata"]["text"] for match in result["matches"]]
 
-        for match in results["matches"]:
-            context_list.append(match["metadata"]["text"])
+    return _merge_context(conversations, looked_up)
 
+def _merge_context(conversations, looked_up):
+    context_list = []
+    for conversation in conversations:
+        context_list.extend(conversation.get("context") or looked_up[id(conversation)])
     return context_list  # List of relevant contexts
 
 def generate_followups(email):
@@ -107,8 +159,17 @@ def generate_followups(email):
     # Extract relevant context from Pinecone
     context_list = get_relevant_context(conversations)
 
+    prompt = _followup_prompt(conversations, context_list)
+
+    # Call Gemini API
+    model = genai.GenerativeModel("gemini-2.0-flash")
+    response = model.generate_content(prompt)
+
+    return _parse_followups(response)
+
+def _followup_prompt(conversations, context_list):
     # Prepare prompt for LLM
-    prompt = f"""
+    return f"""
     You are an AI assistant that helps users by suggesting exactly three helpful follow-up questions they might consider asking next. These questions should guide the user toward resolving their issue more efficiently or exploring the topic further.
 
     Do not generate questions for the bot to ask — generate suggestions *for the user* to ask the bot next.
@@ -119,7 +180,7 @@ def generate_followups(email):
     - Feel natural and assist the user in continuing the conversation meaningfully
 
     **Last User Conversations:**
-    {json.dumps(conversations, indent=2)}
+    {json.dumps([{"query": c["query"], "response": c["response"]} for c in conversations], indent=2)}
 
     **Relevant Knowledge from the Database:**
     {json.dumps(context_list, indent=2)}
@@ -127,10 +188,7 @@ def generate_followups(email):
     Based on the above, generate exactly three follow-up *question suggestions for the user*.
     """
 
-    # Call Gemini API
-    model = genai.GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(prompt)
-
+def _parse_followups(response):
     if response.candidates:
         followup_questions = response.candidates[0].content.parts[0].text.strip().split("\n")
     else:
@@ -140,4 +198,185 @@ def generate_followups(email):
             "Do you need examples or further clarification?"
         ]
 
-    return followup_questions[:3]  # Ensure exactly 3 follow-ups
\ No newline at end of file
+    return followup_questions[:3]  # Ensure exactly 3 follow-ups
+
+def _set_followup_job(job_id, status, followups=None):
+    redis_client.setex(
+        f"followups:{job_id}", FOLLOWUP_RESULT_TTL,
+        json.dumps({"status": status, "followups": followups or []}, ensure_ascii=False)
+    )
+
+def get_followup_job(job_id):
+    """
+    Returns {"status": "pending" | "ready" | "failed", "followups": [...]} for a job, or None if unknown or expired.
+    """
+    job = redis_client.get(f"followups:{job_id}")
+    return json.loads(job) if job else None
+
+def wait_for_followup_job(job_id, timeout=30, interval=0.2):
+    """
+    Blocks until a job is no longer pending, for callers that deliver follow-ups on an open stream.
+    Returns the job, or None if it is unknown or still pending after `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = get_followup_job(job_id)
+        if job is None or job["status"] != "pending":
+            return job
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(interval)
+
+def _run_followup_job(job_id, email, query, response, context, translate):
+    try:
+        store_conversation_redis(email, query, response, context=context)
+        followups = generate_followups(email)
+        if translate is not None:
+            followups = translate(followups)
+        _set_followup_job(job_id, "ready", followups)
+    except Exception as e:
+        print(f"❌ Follow-up generation failed: {e}")
+        _set_followup_job(job_id, "failed")
+
+def _drain_user_queue(email):
+    """Runs one user's jobs in submission order, then forgets the user."""
+    while True:
+        with _user_queues_guard:
+            jobs = _user_queues[email]
+            if not jobs:
+                del _user_queues[email]
+                return
+            job = jobs.popleft()
+        _run_followup_job(*job)
+
+def submit_followups(email, query, response, context=None, translate=None):
+    """
+    Stores the conversation and generates follow-ups in the background.
+    `translate` optionally maps the generated follow-ups before they are published.
+    Returns the job ID to poll with get_followup_job().
+    """
+    job_id = uuid.uuid4().hex
+    _set_followup_job(job_id, "pending")
+    with _user_queues_guard:
+        idle = email not in _user_queues
+        _user_queues.setdefault(email, deque()).append((job_id, email, query, response, context, translate))
+    if idle:
+        followup_executor.submit(_drain_user_queue, email)
+    return job_id
+
+# ------------------ Async variants (ASGI request path) ------------------
+_async_user_queues = {}  # Same as _user_queues, for jobs running as tasks on the event loop
+_background_tasks = set()  # Keeps running follow-up tasks referenced until they finish
+
+async def astore_conversation_redis(email, query, response, context=None):
+    """Async variant of store_conversation_redis."""
+    key = f"chat:{email}:history"
+    conversations = _append_conversation(await async_redis_client.lrange(key, 0, 2), query, response, context)
+
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.rpush(key, *[json.dumps(conv) for conv in conversations])
+        await pipe.execute()
+
+async def aget_last_three_conversations(email):
+    """Async variant of get_last_three_conversations."""
+    conversations = await async_redis_client.lrange(f"chat:{email}:history", 0, 2)
+
+    if not conversations:
+        return [{"query": "Hello", "response": "Hi! How can I help you?"}]  # Default if empty
+
+    return [json.loads(conv) for conv in conversations]
+
+async def aget_embeddings_batch(texts):
+    """Async variant of get_embeddings_batch."""
+    embedding_model = "models/embedding-001"
+
+    async def compute(missing):
+        response = await genai.embed_content_async(model=embedding_model, content=missing, task_type="retrieval_query")
+        return response["embedding"]
+
+    cache = get_embedding_memo()
+    if cache is not None:
+        return await cache.aget_or_compute(embedding_model, "retrieval_query", texts, compute)
+    return await compute(texts)
+
+async def aget_relevant_context(conversations):
+    """Async variant of get_relevant_context; the index client is blocking, so searches run in worker threads."""
+    missing = [conversation for conversation in conversations if not conversation.get("context")]
+    looked_up = {}
+    if missing:
+        index = get_search_index(INDEX_NAME)
+        query_embeddings = await aget_embeddings_batch([conversation["query"] for conversation in missing])
+        results = await asyncio.gather(*[
+            asyncio.to_thread(index.query, vector=vector, top_k=3, include_metadata=True)
+            for vector in query_embeddings
+        ])
+        for conversation, result in zip(missing, results):
+            looked_up[id(conversation)] = [match["metadata"]["text"] for match in result["matches"]]
+
+    return _merge_context(conversations, looked_up)
+
+async def agenerate_followups(email):
+    """Async variant of generate_followups."""
+    conversations = await aget_last_three_conversations(email)
+    context_list = await aget_relevant_context(conversations)
+
+    model = genai.GenerativeModel("gemini-2.0-flash")
+    response = await model.generate_content_async(_followup_prompt(conversations, context_list))
+
+    return _parse_followups(response)
+
+async def _aset_followup_job(job_id, status, followups=None):
+    await async_redis_client.setex(
+        f"followups:{job_id}", FOLLOWUP_RESULT_TTL,
+        json.dumps({"status": status, "followups": followups or []}, ensure_ascii=False)
+    )
+
+async def aget_followup_job(job_id):
+    """Async variant of get_followup_job."""
+    job = await async_redis_client.get(f"followups:{job_id}")
+    return json.loads(job) if job else None
+
+async def await_followup_job(job_id, timeout=30, interval=0.2):
+    """Async variant of wait_for_followup_job."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await aget_followup_job(job_id)
+        if job is None or job["status"] != "pending":
+            return job
+        if time.monotonic() >= deadline:
+            return None
+        await asyncio.sleep(interval)
+
+async def _arun_followup_job(job_id, email, query, response, context, translate):
+    try:
+        await astore_conversation_redis(email, query, response, context=context)
+        followups = await agenerate_followups(email)
+        if translate is not None:
+            followups = await translate(followups)
+        await _aset_followup_job(job_id, "ready", followups)
+    except Exception as e:
+        print(f"❌ Follow-up generation failed: {e}")
+        await _aset_followup_job(job_id, "failed")
+
+async def _adrain_user_queue(email):
+    """Async variant of _drain_user_queue."""
+    jobs = _async_user_queues[email]
+    while jobs:
+        await _arun_followup_job(*jobs.popleft())
+    del _async_user_queues[email]
+
+async def asubmit_followups(email, query, response, context=None, translate=None):
+    """
+    Async variant of submit_followups: the job runs as a task on the current event loop.
+    `translate` is an optional coroutine function mapping the generated follow-ups.
+    """
+    job_id = uuid.uuid4().hex
+    await _aset_followup_job(job_id, "pending")
+    idle = email not in _async_user_queues
+    _async_user_queues.setdefault(email, deque()).append((job_id, email, query, response, context, translate))
+    if idle:
+        task = asyncio.create_task(_adrain_user_queue(email))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return job_id
@@ -1,14 +1,33 @@
+import os
+import asyncio
+from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Optional
-from agents.router_agent import classify_intent
+from agents.router_agent import classify_intent_locally, classify_intent_with_llm, aclassify_intent_with_llm
 from agents.service_recommender import get_service_recommender_agent
-from agents.faq_agent import get_faq_agent
+from agents.faq_agent import get_faq_agent, fused_faq_answer, afused_faq_answer
 from agents.appointment_agent import get_appointment_agent
 from agents.notification_agent import get_notification_agent
-from concurrent.futures import ThreadPoolExecutor
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from utils.memory import build_context
+from utils.resources import get_service_qa_chain, get_faq_qa_chain
 
-# Thread pool for parallel processing
-executor = ThreadPoolExecutor(max_workers=3)
+load_dotenv()
+# Router answers FAQ/complaint turns with one answer-and-label call instead of answering and detecting intent separately.
+# Only queries the local classifier confidently routes to 'complaint' use it; the rest still need the router LLM.
+FUSED_FAQ_MODE = os.getenv("FUSED_FAQ_MODE", "False") == "True"
+# While the LLM routes a query, retrieve for both branches and keep the chosen one's documents.
+# Opt-in: it doubles retrieval load and runs before the answer-cache lookup, so it only pays off when cache hits are rare.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "False") == "True"
+# Two retrievals per request the web server handles at once
+SPECULATIVE_RETRIEVAL_WORKERS = int(os.getenv("SPECULATIVE_RETRIEVAL_WORKERS", 16))
+
+# Thread pool for parallel processing; copies the run context so callbacks (e.g. token streaming) reach the agents
+executor = ContextThreadPoolExecutor(max_workers=3)
+# Speculative retrievals get their own pool so they never queue behind (or hold up) the agents' LLM calls
+retrieval_executor = ContextThreadPoolExecutor(max_workers=SPECULATIVE_RETRIEVAL_WORKERS)
+_discarded_retrievals = set()  # Cancelled async retrievals, referenced until they have wound down
 
 # ------------------ Graph State ------------------
 class GraphState(TypedDict):
@@ -20,15 +39,22 @@ class GraphState(TypedDict):
     name: Optional[str]
     escalate: Optional[bool]
     awaiting_details: Optional[bool]
+    source_documents: Optional[list]  # Documents retrieved for the answer, reused for follow-ups
+    fused: Optional[dict]  # Answer and labels from the router's fused call, consumed by faq_node
+    retrieved: Optional[list]  # Documents retrieved while routing, consumed by service_node/faq_node
+
+# Each node has a sync and an async version; the sync ones serve invoke()/stream(),
+# the async ones serve ainvoke()/astream() without blocking the event loop.
 
 # ------------------ Router Node ------------------
-def router_node(state: GraphState) -> GraphState:
+def _router_query(state: GraphState) -> str:
     print(f"[Router Node] Incoming state: {state}")
     query = state.get("query")
     if not query:
         raise ValueError("❌ Missing 'query' in state at router_node")
+    return query
 
-    intent = classify_intent(query)
+def _apply_intent(state: GraphState, intent: str) -> GraphState:
     print(f"[Router Node] Detected intent: {intent}")
 
     if state.get("awaiting_details"):
@@ -40,34 +66,134 @@ def router_node(state: GraphState) -> GraphState:
 
     return state
 
+def _use_fused(state: GraphState, local_intent: Optional[str]) -> bool:
+    # The fused call doesn't route, so it is only made once the local classifier has settled on 'complaint'
+    return FUSED_FAQ_MODE and local_intent == "complaint" and not state.get("awaiting_details")
+
+def _apply_fused(state: GraphState, fused: dict) -> GraphState:
+    state["fused"] = fused
+    return _apply_intent(state, "complaint")
+
+def _use_speculation(state: GraphState) -> bool:
+    return SPECULATIVE_RETRIEVAL and not state.get("awaiting_details")
+
+def _speculative_retrievers() -> dict:
+    # Branch intent -> retriever of the QA chain that branch answers with
+    chains = {"service": get_service_qa_chain(), "complaint": get_faq_qa_chain()}
+    return {intent: chain.retriever for intent, chain in chains.items() if chain is not None}
+
+def _retrieval_failed(e: Exception):
+    print(f"⚠️ Speculative retrieval failed, the agent will retrieve itself: {e}")
+
+def _finish_discarded(retrieval):
+    # Consume the outcome of the branch that wasn't taken so its error is never reported as unhandled
+    _discarded_retrievals.discard(retrieval)
+    if not retrieval.cancelled():
+        retrieval.exception()
+
+def router_node(state: GraphState) -> GraphState:
+    query = _router_query(state)
+    intent = classify_intent_locally(query)
+    if _use_fused(state, intent):
+        fused = fused_faq_answer(query, state["email"])
+        if fused is not None:
+            return _apply_fused(state, fused)
+    if intent is not None:
+        return _apply_intent(state, intent)
+    if not _use_speculation(state):
+        return _apply_intent(state, classify_intent_with_llm(query))
+
+    contextual_query = build_context(state["email"], query)
+    retrievals = {
+        branch: retrieval_executor.submit(retriever.invoke, contextual_query)
+        for branch, retriever in _speculative_retrievers().items()
+    }
+    state = _apply_intent(state, classify_intent_with_llm(query))
+
+    chosen = retrievals.pop(state["intent"], None)
+    for other in retrievals.values():
+        # A retrieval still queued in the pool is cancelled; one already running finishes there and is dropped
+        other.cancel()
+        other.add_done_callback(_finish_discarded)
+    state["retrieved"] = None
+    if chosen is not None:
+        try:
+            state["retrieved"] = chosen.result()
+        except Exception as e:
+            _retrieval_failed(e)
+    return state
+
+async def arouter_node(state: GraphState) -> GraphState:
+    query = _router_query(state)
+    intent = classify_intent_locally(query)
+    if _use_fused(state, intent):
+        fused = await afused_faq_answer(query, state["email"])
+        if fused is not None:
+            return _apply_fused(state, fused)
+    if intent is not None:
+        return _apply_intent(state, intent)
+    if not _use_speculation(state):
+        return _apply_intent(state, await aclassify_intent_with_llm(query))
+
+    contextual_query = build_context(state["email"], query)
+    retrievals = {
+        branch: asyncio.create_task(retriever.ainvoke(contextual_query))
+        for branch, retriever in _speculative_retrievers().items()
+    }
+    state = _apply_intent(state, await aclassify_intent_with_llm(query))
+
+    chosen = retrievals.pop(state["intent"], None)
+    for other in retrievals.values():
+        other.cancel()
+        _discarded_retrievals.add(other)
+        other.add_done_callback(_finish_discarded)
+    state["retrieved"] = None
+    if chosen is not None:
+        try:
+            state["retrieved"] = await chosen
+        except Exception as e:
+            _retrieval_failed(e)
+    return state
+
 # ------------------ Service Node ------------------
 service_agent = get_service_recommender_agent()
 
+def _apply_service_result(state: GraphState, result: dict) -> GraphState:
+    print(f"[Service Node] Response: {result}")
+    state["response"] = result["result"]
+    state["source_documents"] = result.get("source_documents")
+    state["retrieved"] = None
+    return state
+
 def service_node(state: GraphState) -> GraphState:
     print(f"[Service Node] Query: {state.get('query')} | Email: {state.get('email')}")
     
     future = executor.submit(service_agent.invoke, {
         "query": state["query"],
-        "email": state["email"]
+        "email": state["email"],
+        "documents": state.get("retrieved")
     }, config={"configurable": {"session_id": state["email"]}})
     
-    result = future.result()
-    print(f"[Service Node] Response: {result}")
-    state["response"] = result["result"]
-    return state
+    return _apply_service_result(state, future.result())
 
-# ------------------ FAQ Node ------------------
-def faq_node(state: GraphState) -> GraphState:
-    print(f"[FAQ Node] Query: {state.get('query')} | Email: {state.get('email')}")
-    
-    faq_agent = get_faq_agent()
-    result = faq_agent.invoke({
+async def aservice_node(state: GraphState) -> GraphState:
+    print(f"[Service Node] Query: {state.get('query')} | Email: {state.get('email')}")
+
+    result = await service_agent.ainvoke({
         "query": state["query"],
-        "email": state["email"]
-    })
+        "email": state["email"],
+        "documents": state.get("retrieved")
+    }, config={"configurable": {"session_id": state["email"]}})
+
+    return _apply_service_result(state, result)
 
+# ------------------ FAQ Node ------------------
+def _apply_faq_result(state: GraphState, result: dict) -> GraphState:
     state["response"] = result.get("result", "⚠️ Something went wrong while answering your query.")
     state["escalate"] = result.get("escalate", False)
+    state["source_documents"] = result.get("source_documents")
+    state["fused"] = None
+    state["retrieved"] = None
 
     if state["escalate"]:
         if "query" in result:
@@ -76,9 +202,41 @@ def faq_node(state: GraphState) -> GraphState:
 
     return state
 
+def faq_node(state: GraphState) -> GraphState:
+    print(f"[FAQ Node] Query: {state.get('query')} | Email: {state.get('email')}")
+    
+    faq_agent = get_faq_agent()
+    result = faq_agent.invoke({
+        "query": state["query"],
+        "email": state["email"],
+        "fused": state.get("fused"),
+        "documents": state.get("retrieved")
+    })
+
+    return _apply_faq_result(state, result)
+
+async def afaq_node(state: GraphState) -> GraphState:
+    print(f"[FAQ Node] Query: {state.get('query')} | Email: {state.get('email')}")
+
+    faq_agent = get_faq_agent()
+    result = await faq_agent.ainvoke({
+        "query": state["query"],
+        "email": state["email"],
+        "fused": state.get("fused"),
+        "documents": state.get("retrieved")
+    })
+
+    return _apply_faq_result(state, result)
+
 # ------------------ Appointment Node ------------------
 appointment_agent = get_appointment_agent()
 
+def _apply_appointment_result(state: GraphState, result: dict) -> GraphState:
+    print(f"[Appointment Node] Complaint Log Result: {result['result']}")
+    state["response"] = result["result"]
+    state["summary"] = result.get("summary")
+    return state
+
 def appointment_node(state: GraphState) -> GraphState:
     print(f"[Appointment Node] Escalated Query: {state.get('query')} | Email: {state.get('email')}")
 
@@ -87,23 +245,29 @@ def appointment_node(state: GraphState) -> GraphState:
         "email": state["email"]
     })
     
-    result = future.result()
-    print(f"[Appointment Node] Complaint Log Result: {result['result']}")
-    state["response"] = result["result"]
-    state["summary"] = result.get("summary")
-    return state
+    return _apply_appointment_result(state, future.result())
+
+async def aappointment_node(state: GraphState) -> GraphState:
+    print(f"[Appointment Node] Escalated Query: {state.get('query')} | Email: {state.get('email')}")
+
+    result = await appointment_agent.ainvoke({
+        "query": state["query"],
+        "email": state["email"]
+    })
+
+    return _apply_appointment_result(state, result)
 
 # ------------------ Notification Node ------------------
 notify_agent = get_notification_agent()
 
-def notification_node(state: GraphState) -> GraphState:
-    future = executor.submit(notify_agent.invoke, {
+def _notification_payload(state: GraphState) -> dict:
+    return {
         "summary": state.get("summary"),
         "email": state.get("email"),
         "name": state.get("name", "User")
-    })
-    
-    result = future.result()
+    }
+
+def _apply_notification_result(state: GraphState, result: dict) -> GraphState:
     print(f"[Notification Node] Notification Response: {result['result']}")
 
     summary_text = state.get("summary", "No summary available.")
@@ -115,6 +279,15 @@ def notification_node(state: GraphState) -> GraphState:
 
     return state
 
+def notification_node(state: GraphState) -> GraphState:
+    future = executor.submit(notify_agent.invoke, _notification_payload(state))
+    return _apply_notification_result(state, future.result())
+
+async def anotification_node(state: GraphState) -> GraphState:
+    # SMTP is blocking; RunnableLambda.ainvoke runs it in a worker thread
+    result = await notify_agent.ainvoke(_notification_payload(state))
+    return _apply_notification_result(state, result)
+
 # ------------------ Collect Details Node ------------------
 def collect_details_node(state: GraphState) -> GraphState:
     print("📝 Collecting complaint details from user...")
@@ -128,12 +301,12 @@ def collect_details_node(state: GraphState) -> GraphState:
 def create_langgraph_flow():
     builder = StateGraph(GraphState)
 
-    builder.add_node("router", router_node)
-    builder.add_node("service", service_node)
-    builder.add_node("faq", faq_node)
+    builder.add_node("router", RunnableLambda(router_node, afunc=arouter_node, name="router"))
+    builder.add_node("service", RunnableLambda(service_node, afunc=aservice_node, name="service"))
+    builder.add_node("faq", RunnableLambda(faq_node, afunc=afaq_node, name="faq"))
     builder.add_node("collect", collect_details_node)
-    builder.add_node("appointment", appointment_node)
-    builder.add_node("notify", notification_node)
+    builder.add_node("appointment", RunnableLambda(appointment_node, afunc=aappointment_node, name="appointment"))
+    builder.add_node("notify", RunnableLambda(notification_node, afunc=anotification_node, name="notify"))
 
     builder.set_entry_point("router")
 
@@ -155,6 +328,3 @@ def create_langgraph_flow():
     builder.add_edge("service", END)
 
     return builder.compile()
-
-# ✅ Compile the flow
-langgraph_flow = create_langgraph_flow()
@@ -6,31 +6,19 @@ from dotenv import load_dotenv
 from async_google_trans_new import AsyncTranslator
 from langdetect import detect
 from flask import Blueprint, request, jsonify, Response
-from main.utils import create_qa_chain
-from main.followup import store_conversation_redis, generate_followups
-from main.langgraph_flow import create_langgraph_flow, GraphState
-from langchain_community.vectorstores import Pinecone as PineconeVectorStore  
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from main.followup import store_conversation_redis, generate_followups, submit_followups, get_followup_job, wait_for_followup_job
+from main.utils import ANSWER_STREAM_TAG
+from main.langgraph_flow import GraphState
+from utils.resources import get_langgraph_flow, get_service_qa_chain
+from utils.answer_cache import get_answer_cache
+from agents.router_agent import get_router_classifier
+from utils.lexical_index import HYBRID_RETRIEVAL, retrieval_stats
 
 main = Blueprint('main', __name__)
 
 load_dotenv()
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
-
-def load_vector_store():
-    try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        vector_store = PineconeVectorStore.from_existing_index(index_name=PINECONE_INDEX_NAME, embedding=embeddings)
-        print("[Vector Store] Loaded successfully")
-        return vector_store
-    except Exception as e:
-        print(f"❌ Error loading vector store: {e}")
-        return None
-
-vector_store = load_vector_store()
-qa_chain = create_qa_chain(vector_store)
-
+FOLLOWUPS_IN_BACKGROUND = os.getenv("FOLLOWUPS_IN_BACKGROUND", "True") == "True"  # Answer first, poll /followups/<id>
+STREAM_FOLLOWUP_TIMEOUT = float(os.getenv("STREAM_FOLLOWUP_TIMEOUT", 30))  # Seconds /query/stream waits for follow-ups
 
 def make_links_clickable(text):
     """Ensure URLs are clickable by keeping them in plain text."""
@@ -43,6 +31,27 @@ def home():
     """API home route."""
     return jsonify({"message": "Welcome to the CopBot Chat API!"})
 
+@main.route("/stats/answer-cache", methods=["GET"])
+def answer_cache_stats():
+    """Hit rate and generation time saved by the semantic answer cache."""
+    cache = get_answer_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+@main.route("/stats/intent-classifier", methods=["GET"])
+def intent_classifier_stats():
+    """Share of routing decisions made by the local classifier instead of the LLM."""
+    classifier = get_router_classifier()
+    if classifier is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **classifier.stats()})
+
+@main.route("/stats/retrieval", methods=["GET"])
+def hybrid_retrieval_stats():
+    """Share of retrievals answered by the local keyword index without a vector search."""
+    return jsonify({"enabled": HYBRID_RETRIEVAL, **retrieval_stats()})
+
 users = {}
 
 @main.route('/signin', methods=['POST'])
@@ -81,7 +90,25 @@ async def translate_text(text, target_lang="en"):
     translator = AsyncTranslator()
     return await translator.translate(text, target_lang)
 
-langgraph_flow = create_langgraph_flow()  
+def followup_translator(language):
+    """Callable that translates follow-ups back to the user's language inside the background job."""
+    if language not in ["ta", "hi"]:
+        return None
+
+    async def translate_all(followups):
+        return await asyncio.gather(*[translate_text(f, target_lang=language) for f in followups])
+
+    return lambda followups: list(asyncio.run(translate_all(followups)))
+
+def afollowup_translator(language):
+    """Async counterpart of followup_translator, for follow-up jobs running on the event loop."""
+    if language not in ["ta", "hi"]:
+        return None
+
+    async def translate_all(followups):
+        return list(await asyncio.gather(*[translate_text(f, target_lang=language) for f in followups]))
+
+    return translate_all
 
 @main.route("/query", methods=["POST"])
 async def query_chatbot():
@@ -108,17 +135,32 @@ async def query_chatbot():
                 query_translated = await translate_text(query, target_lang="en")
 
             try:
-                result = langgraph_flow.invoke(GraphState({"query": query_translated, "email": email}))
+                result = get_langgraph_flow().invoke(GraphState({"query": query_translated, "email": email}))
                 formatted_answer = make_links_clickable(result.get("response", "Sorry, I couldn't find an answer."))
             except Exception as e:
                 print(f"⚠️ LangGraph failed, falling back to LangChain: {e}")
-                result = qa_chain.invoke({"query": query_translated})
+                result = get_service_qa_chain().invoke({"query": query_translated})
                 formatted_answer = make_links_clickable(result["result"])
 
             if language in ["ta", "hi"]:
                 formatted_answer = await translate_text(formatted_answer, target_lang=language)
 
-            store_conversation_redis(email, query, formatted_answer)
+            source_documents = result.get("source_documents") or []
+            context = [doc.page_content for doc in source_documents]
+
+            if FOLLOWUPS_IN_BACKGROUND:
+                followups_id = submit_followups(email, query, formatted_answer, context, followup_translator(language))
+                return Response(
+                    json.dumps({
+                        "email": email,
+                        "answer": formatted_answer,
+                        "followups": [],
+                        "followups_id": followups_id
+                    }, ensure_ascii=False),
+                    content_type="application/json; charset=utf-8"
+                )
+
+            store_conversation_redis(email, query, formatted_answer, context=context)
 
             followups = generate_followups(email)
             if language in ["ta", "hi"]:
@@ -138,3 +180,94 @@ async def query_chatbot():
     except Exception as e:
         print(f"❌ Error processing query: {e}")
         return jsonify({"error": str(e)}), 500
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@main.route("/query/stream", methods=["POST"])
+async def query_chatbot_stream():
+    """
+    Streaming variant of /query. Emits `token` events with answer text as the model
+    generates it (English answers only, translated answers arrive whole), then an
+    `answer` event with the final formatted answer, a `metadata` event with the
+    intent and escalation state, a `followups` event and a closing `done` event.
+    """
+    data = request.json
+    user_id = data.get("user_id")
+    email = data.get("email")
+    query = data.get("query", "").strip()
+    print("📥 Incoming (stream):", data)
+
+    if not user_id or not email:
+        return jsonify({"error": "User ID and email are required"}), 400
+    if not query:
+        return jsonify({"email": email})
+
+    try:
+        language = await detect_language(query)
+    except Exception as e:
+        print(f"❌ Language detection failed: {e}")
+        language = "en"
+    query_translated = query
+    if language in ["ta", "hi"]:
+        query_translated = await translate_text(query, target_lang="en")
+
+    def generate():
+        result = None
+        try:
+            for mode, chunk in get_langgraph_flow().stream(
+                GraphState({"query": query_translated, "email": email}), stream_mode=["messages", "values"]
+            ):
+                if mode == "values":
+                    result = chunk
+                    continue
+                message, metadata = chunk
+                if language == "en" and message.content and ANSWER_STREAM_TAG in metadata.get("tags", []):
+                    yield sse_event("token", {"text": message.content})
+            answer = result.get("response", "Sorry, I couldn't find an answer.")
+        except Exception as e:
+            print(f"⚠️ LangGraph failed, falling back to LangChain: {e}")
+            try:
+                result = get_service_qa_chain().invoke({"query": query_translated})
+                answer = result["result"]
+            except Exception as e:
+                print(f"❌ Error processing query: {e}")
+                yield sse_event("error", {"error": str(e)})
+                yield sse_event("done", {})
+                return
+
+        formatted_answer = make_links_clickable(answer)
+        if language in ["ta", "hi"]:
+            formatted_answer = asyncio.run(translate_text(formatted_answer, target_lang=language))
+        yield sse_event("answer", {"email": email, "answer": formatted_answer})
+        yield sse_event("metadata", {
+            "intent": result.get("intent"),
+            "escalate": bool(result.get("escalate")),
+            "awaiting_details": bool(result.get("awaiting_details"))
+        })
+
+        source_documents = result.get("source_documents") or []
+        followups_id = submit_followups(
+            email, query, formatted_answer, [doc.page_content for doc in source_documents], followup_translator(language)
+        )
+        job = wait_for_followup_job(followups_id, timeout=STREAM_FOLLOWUP_TIMEOUT)
+        yield sse_event("followups", {"followups_id": followups_id, "followups": job["followups"] if job else []})
+        yield sse_event("done", {})
+
+    return Response(
+        generate(),
+        content_type="text/event-stream; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@main.route("/followups/<followups_id>", methods=["GET"])
+def poll_followups(followups_id):
+    """Follow-up suggestions generated in the background for a /query answer."""
+    job = get_followup_job(followups_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired follow-ups ID"}), 404
+    return Response(
+        json.dumps({"followups_id": followups_id, **job}, ensure_ascii=False),
+        content_type="application/json; charset=utf-8"
+    )
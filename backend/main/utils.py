@@ -1,23 +1,34 @@
 import os
+import csv
 import warnings
 import pandas as pd
-from typing import List
+from typing import List, Literal
 from dotenv import load_dotenv
 
 load_dotenv()
 warnings.filterwarnings('ignore')
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
 from langchain_community.document_loaders import PyPDFLoader, CSVLoader, Docx2txtLoader, UnstructuredExcelLoader, TextLoader
 from langchain_core.documents import Document
 from langchain.chains.retrieval_qa.base import RetrievalQA
 from pinecone import Pinecone, ServerlessSpec
 from langchain_community.vectorstores import Pinecone as PineconeVectorStore  
-from langchain_core.pydantic_v1 import BaseModel
-from agentic_chunker import AgenticChunker
+from langchain_core.pydantic_v1 import BaseModel, Field
+from langchain_core.runnables import RunnableLambda
+from agentic_chunker import AgenticChunker, chunk_texts_parallel
+from utils.ingest_config import (
+    EMBEDDING_BATCH_SIZE, TABULAR_QA_INGESTION, CHUNKING_WORKERS, GEMINI_REQUESTS_PER_MINUTE, get_chunker_options
+)
+from utils.embedding_cache import get_embeddings
+from utils.llm import get_llm
+from utils.lexical_index import hybrid_retriever
+from utils.qa_loader import load_qa_csv
+from database.ingest_manifest import vector_id
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+PINECONE_INDEX_NAME1 = os.getenv("PINECONE_INDEX_NAME1")  # FAQ index name
+ANSWER_STREAM_TAG = "answer"  # Tags the QA chain LLMs whose tokens /query/stream forwards
 
 def load_documents(directory: str) -> List[Document]:
     documents = []
@@ -36,6 +47,9 @@ def load_documents(directory: str) -> List[Document]:
         try:
             if ext == ".pdf":
                 loader = PyPDFLoader(file_path)
+            elif ext == ".csv" and TABULAR_QA_INGESTION:
+                documents.extend(load_qa_csv(file_path))
+                continue
             elif ext == ".csv":
                 loader = CSVLoader(file_path)
             elif ext in [".doc", ".docx"]:
@@ -60,14 +74,27 @@ class Sentences(BaseModel):
     sentences: List[str]
 
 def agentic_chunking(text: str) -> List[str]:
-    ac = AgenticChunker()
+    ac = AgenticChunker(**get_chunker_options())
     ac.chunk(text)
     return ac.get_chunks(get_type='list_of_strings')
 
-def split_documents(documents: List[Document]) -> List[Document]:
-    chunks = []
-    for doc in documents:
-        doc_chunks = agentic_chunking(doc.page_content)
+def split_documents(documents: List[Document], workers: int = CHUNKING_WORKERS) -> List[Document]:
+    # Q&A rows are already one chunk each and skip agentic chunking
+    ready = [doc for doc in documents if doc.metadata.get("content_type") == "qa_pair"]
+    documents = [doc for doc in documents if doc.metadata.get("content_type") != "qa_pair"]
+
+    if workers > 1:
+        chunked = [[] for _ in documents]
+        for position, doc_chunks in chunk_texts_parallel(
+            [doc.page_content for doc in documents], workers, GEMINI_REQUESTS_PER_MINUTE,
+            **get_chunker_options()
+        ):
+            chunked[position] = doc_chunks or []  # None marks a failed text
+    else:
+        chunked = [agentic_chunking(doc.page_content) for doc in documents]
+
+    chunks = list(ready)
+    for doc, doc_chunks in zip(documents, chunked):
         for chunk in doc_chunks:
             chunks.append(Document(page_content=chunk, metadata=doc.metadata))
     return chunks
@@ -110,11 +137,13 @@ def create_pinecone_vector_store(documents: List[Document], recreate=False):
         print(f"Pinecone index '{PINECONE_INDEX_NAME}' is ready.")
 
         # Add documents to vector store
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+        embeddings = get_embeddings()
         vector_store = PineconeVectorStore.from_documents(
             documents=documents,
             embedding=embeddings,
-            index_name=PINECONE_INDEX_NAME
+            index_name=PINECONE_INDEX_NAME,
+            ids=[vector_id(doc) for doc in documents],  # Re-running overwrites instead of duplicating
+            embedding_chunk_size=EMBEDDING_BATCH_SIZE
         )
         print(f"Successfully added {len(documents)} documents to Pinecone.")
         return vector_store
@@ -124,7 +153,7 @@ def create_pinecone_vector_store(documents: List[Document], recreate=False):
         return None
 
 
-def create_qa_chain(vector_store):
+def create_qa_chain(vector_store, index_name=PINECONE_INDEX_NAME):
     try:
         system_instruction="""
            You are NOVA, a multilingual AI-powered Customer Support Chatbot designed for Star Systems India Private Limited, a software technology services company. Your primary role is to assist prospective and existing clients by offering prompt, accurate, and context-aware responses regarding the company's services, technologies, processes, and other support-related needs.
@@ -190,9 +219,11 @@ def create_qa_chain(vector_store):
 
         Always strive to create a seamless, helpful, and delightful experience for the user. Be the friendly bridge between Star Systems and its customers.
                 """
-        llm = ChatGoogleGenerativeAI(
+        llm = get_llm(
             model="gemini-2.0-flash",
             temperature=0.8,
+            google_api_key=None,
+            tags=[ANSWER_STREAM_TAG],
             convert_system_message_to_human=True,
             system=system_instruction,
             model_kwargs={
@@ -201,10 +232,10 @@ def create_qa_chain(vector_store):
                 "top_p": 0.95
             }
         )
-        retriever = vector_store.as_retriever(
+        retriever = hybrid_retriever(vector_store.as_retriever(
             search_type="similarity", 
             search_kwargs={"k": 3}
-        )
+        ), index_name, k=3)
         return RetrievalQA.from_chain_type(
             llm=llm, 
             chain_type="stuff", 
@@ -215,9 +246,7 @@ def create_qa_chain(vector_store):
         print(f"Error creating QA chain: {e}")
         return None
 
-def create_qa_chain1(vector_store):
-    try:
-        system_instruction="""
+FAQ_SYSTEM_INSTRUCTION = """
                 You are a multilingual AI-powered Support & Complaint Resolution Assistant for Star Systems India Private Limited, 
                 a technology services company. Your role is to understand user concerns, assist with software or service-related issues, 
                 and either resolve them in-chat or escalate to human support by collecting necessary details for appointment booking.
@@ -262,21 +291,26 @@ def create_qa_chain1(vector_store):
                 needed, gather all relevant details, generate a complaint summary, and notify the human support team — 
                 all while making the user feel heard and supported.
                 """
-        llm = ChatGoogleGenerativeAI(
+
+def create_qa_chain1(vector_store, index_name=PINECONE_INDEX_NAME1):
+    try:
+        llm = get_llm(
             model="gemini-2.0-flash",
             temperature=1.0,
+            google_api_key=None,
+            tags=[ANSWER_STREAM_TAG],
             convert_system_message_to_human=True,
-            system=system_instruction,
+            system=FAQ_SYSTEM_INSTRUCTION,
             model_kwargs={
                 "max_output_tokens": 8192,
                 "top_k": 10,
                 "top_p": 0.95
             }
         )
-        retriever = vector_store.as_retriever(
+        retriever = hybrid_retriever(vector_store.as_retriever(
             search_type="similarity", 
             search_kwargs={"k": 5}
-        )
+        ), index_name, k=5)
         return RetrievalQA.from_chain_type(
             llm=llm, 
             chain_type="stuff", 
@@ -286,3 +320,63 @@ def create_qa_chain1(vector_store):
     except Exception as e:
         print(f"Error creating QA chain: {e}")
         return None
+
+class FusedFAQAnswer(BaseModel):
+    """Reply to the user's latest message together with its intent labels."""
+    answer: str = Field(description="The reply to the user, based only on the provided context")
+    intent: Literal["complaint", "affirmation", "general"] = Field(
+        description="'complaint' when reporting a problem, issue or dissatisfaction; 'affirmation' when confirming "
+                    "they want further help (e.g. 'yes', 'please help', 'sure'); 'general' for anything else"
+    )
+    escalate: bool = Field(
+        description="True only when the user confirms they want the support team's help with a problem "
+                    "reported earlier in the conversation"
+    )
+
+def _fused_prompt(payload, documents):
+    context = "\n\n".join(doc.page_content for doc in documents)
+    return f"""
+                Use the context below to reply to the user's latest message, and label the message.
+
+                Context:
+                {context}
+
+                Conversation History (with the intent of each earlier message):
+                {payload.get("history", "")}
+
+                User's Latest Message:
+                {payload["message"]}
+                """
+
+def create_fused_faq_chain(vector_store, index_name=PINECONE_INDEX_NAME1):
+    """
+    Single-call alternative to create_qa_chain1 plus the intent classifiers: one
+    structured-output request returns the answer, the intent and the escalation
+    flag. Routing stays with the router, which only calls this for complaints. Takes {"query": retrieval query, "message": latest message,
+    "history": conversation text} and returns the FusedFAQAnswer fields plus
+    "source_documents".
+    """
+    try:
+        llm = get_llm(
+            model="gemini-2.0-flash",
+            google_api_key=None,
+            convert_system_message_to_human=True,
+            system=FAQ_SYSTEM_INSTRUCTION,
+        ).with_structured_output(FusedFAQAnswer)
+        retriever = hybrid_retriever(vector_store.as_retriever(
+            search_type="similarity",
+            search_kwargs={"k": 5}
+        ), index_name, k=5)
+
+        def invoke(payload):
+            documents = retriever.invoke(payload["query"])
+            return {**llm.invoke(_fused_prompt(payload, documents)).dict(), "source_documents": documents}
+
+        async def ainvoke(payload):
+            documents = await retriever.ainvoke(payload["query"])
+            return {**(await llm.ainvoke(_fused_prompt(payload, documents))).dict(), "source_documents": documents}
+
+        return RunnableLambda(invoke, afunc=ainvoke, name="fused_faq")
+    except Exception as e:
+        print(f"Error creating fused FAQ chain: {e}")
+        return None
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The backend runs from its own directory with top-level imports (utils.x, main.x)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_CACHE_PATH", "")  # No chunker response cache file during tests
+os.environ.setdefault("GOOGLE_API_KEY2", "test-key")  # The router builds its Gemini client at import time
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+from agentic_chunker import AgenticChunker
+
+
+def make_chunker(**kwargs):
+    chunker = AgenticChunker(gemini_api_key="test-key", **kwargs)
+    chunker.print_logging = False
+    return chunker
+
+
+class ScriptedModel:
+    """Answers chunker prompts: routing prompts from a script, everything else with fixed text."""
+    def __init__(self, routings=(), relevant_chunk="No chunks"):
+        self.routings = list(routings)
+        self.relevant_chunk = relevant_chunk
+        self.prompts = []
+
+    def __call__(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        if "Assign every proposition below to a chunk" in prompt:
+            return self.routings.pop(0)
+        if "Determine whether or not the \"Proposition\"" in prompt:
+            return self.relevant_chunk
+        return "generated metadata"
+
+    def count(self, marker):
+        return sum(marker in prompt for prompt in self.prompts)
+
+
+def test_each_window_is_routed_with_one_call_and_grown_chunks_refreshed_once():
+    model = ScriptedModel(routings=[
+        json.dumps({
+            "assignments": [{"index": 0, "chunk": "new-1"}, {"index": 1, "chunk": "new-2"}, {"index": 2, "chunk": "new-1"}],
+            "new_chunks": {"new-1": {"title": "Cloud", "summary": "Cloud services"},
+                           "new-2": {"title": "Mobile", "summary": "Mobile apps"}},
+        }),
+    ])
+    chunker = make_chunker(batch_size=3)
+    chunker._make_api_call = model
+
+    chunker.add_propositions_batched(["We migrate apps to AWS.", "We build iOS apps.", "We manage Azure tenants."])
+
+    chunks = {chunk["title"]: chunk["propositions"] for chunk in chunker.chunks.values()}
+    assert chunks == {"Cloud": ["We migrate apps to AWS.", "We manage Azure tenants."], "Mobile": ["We build iOS apps."]}
+    assert model.count("Assign every proposition below to a chunk") == 1
+    assert len(model.prompts) == 1  # New chunks came with their title and summary
+
+
+def test_a_window_with_a_bad_routing_response_is_routed_one_at_a_time():
+    model = ScriptedModel(routings=["not json"])
+    chunker = make_chunker(batch_size=2)
+    chunker._make_api_call = model
+
+    chunker.add_propositions_batched(["We migrate apps to AWS.", "We build iOS apps."])
+
+    assert sorted(p for chunk in chunker.chunks.values() for p in chunk["propositions"]) == [
+        "We build iOS apps.", "We migrate apps to AWS."
+    ]
+    assert model.count("Determine whether or not the \"Proposition\"") == 1
+
+
+def test_embedding_routing_only_asks_the_llm_inside_the_ambiguity_band():
+    vectors = {
+        "We migrate apps to AWS.": [1.0, 0.0],
+        "We manage Azure tenants.": [0.99, 0.1],  # Close to the cloud centroid: attached without asking
+        "We build iOS apps.": [0.0, 1.0],  # Far from everything: a new chunk without asking
+        "We host mobile backends in the cloud.": [0.8, 0.6],  # Ambiguous: the LLM decides
+    }
+    model = ScriptedModel()
+    chunker = make_chunker(use_embeddings=True, similarity_threshold=0.9, ambiguity_margin=0.2)
+    chunker._make_api_call = model
+    chunker._embed = lambda texts: [np.asarray(vectors[text], dtype=np.float32) for text in texts]
+
+    chunker.add_propositions_by_embedding(list(vectors))
+
+    groups = sorted(chunk["propositions"] for chunk in chunker.chunks.values())
+    assert groups == [
+        ["We build iOS apps."],
+        ["We host mobile backends in the cloud."],
+        ["We migrate apps to AWS.", "We manage Azure tenants."],
+    ]
+    assert model.count("Determine whether or not the \"Proposition\"") == 1
+    outline = next(prompt for prompt in model.prompts if "Determine whether or not" in prompt)
+    assert "We migrate apps to AWS." in outline and "We build iOS apps." not in outline  # Only the candidate chunk
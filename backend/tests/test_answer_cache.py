@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+from database import ingest_manifest
+from utils import answer_cache
+from utils.answer_cache import SemanticAnswerCache
+
+
+class CountingChain:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return {"query": inputs["query"], "result": f"answer {self.calls}", "source_documents": []}
+
+
+class FixedEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def test_cached_results_cannot_be_modified_by_callers():
+    cache = SemanticAnswerCache(version_source=lambda name: 1)
+    result = {"result": "answer", "source_documents": []}
+    cache.put("index", "query", [1.0, 0.0], result, latency=1.0)
+    result["result"] = "changed by the caller that stored it"
+
+    hit = cache.get("index", [1.0, 0.0])
+    hit["source_documents"].append("changed by the caller that read it")
+
+    assert cache.get("index", [1.0, 0.0]) == {"result": "answer", "source_documents": []}
+
+
+def test_use_cache_false_bypasses_the_shared_cache(monkeypatch):
+    cache = SemanticAnswerCache(version_source=lambda name: 1)
+    monkeypatch.setattr(answer_cache, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(answer_cache, "get_shared_embeddings", FixedEmbeddings)
+    chain = CountingChain()
+
+    answer_cache.invoke_qa_chain(chain, "services", "User: what do you offer?")
+    answer_cache.invoke_qa_chain(chain, "services", "User: what do you offer?")
+    answer_cache.invoke_qa_chain(chain, "faq", "User: my order is late", use_cache=False)
+    answer_cache.invoke_qa_chain(chain, "faq", "User: my order is late", use_cache=False)
+
+    assert chain.calls == 3
+    assert cache.hits == 1
+
+
+def test_async_lookups_check_the_index_version_off_the_event_loop(monkeypatch):
+    threads = set()
+
+    def index_version(name):
+        threads.add(threading.get_ident())
+        return 1
+
+    class AsyncCountingChain(CountingChain):
+        async def ainvoke(self, inputs):
+            return self.invoke(inputs)
+
+    cache = SemanticAnswerCache(version_source=index_version)
+    monkeypatch.setattr(answer_cache, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(answer_cache, "get_shared_embeddings", FixedEmbeddings)
+    chain = AsyncCountingChain()
+
+    async def run():
+        await answer_cache.ainvoke_qa_chain(chain, "services", "User: what do you offer?")
+        await answer_cache.ainvoke_qa_chain(chain, "services", "User: what do you offer?")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+
+    assert chain.calls == 1 and cache.hits == 1
+    assert threads and loop_thread not in threads
+
+
+def test_reingesting_an_index_invalidates_only_its_answers(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_manifest, "MANIFEST_DB_PATH", str(tmp_path / "manifest.db"))
+    ingest_manifest.init_manifest_db()
+    cache = SemanticAnswerCache()
+    cache.put("services", "what do you offer?", [1.0, 0.0], {"result": "old answer"}, latency=1.0)
+    cache.put("faq", "how do I reset?", [1.0, 0.0], {"result": "faq answer"}, latency=1.0)
+
+    ingest_manifest.record_file("Dataset/services.csv", "new-hash", ["id-1"], "services")
+
+    assert cache.get("services", [1.0, 0.0]) is None
+    assert cache.get("faq", [1.0, 0.0]) == {"result": "faq answer"}
+
+
+def test_expired_and_least_recently_used_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(ttl=60, max_entries=2, version_source=lambda name: 1)
+    cache.put("services", "cloud", [1.0, 0.0, 0.0], {"result": "cloud"}, latency=1.0)
+    cache.put("services", "kubernetes", [0.0, 1.0, 0.0], {"result": "kubernetes"}, latency=1.0)
+    assert cache.get("services", [1.0, 0.0, 0.0]) == {"result": "cloud"}  # "kubernetes" is now the oldest
+    cache.put("services", "mobile", [0.0, 0.0, 1.0], {"result": "mobile"}, latency=1.0)
+
+    assert cache.get("services", [0.0, 1.0, 0.0]) is None
+    now[0] += 61
+    assert cache.get("services", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["entries"] == {"services": 0}
+
+
+def test_only_similar_enough_queries_hit():
+    cache = SemanticAnswerCache(threshold=0.95, version_source=lambda name: 1)
+    cache.put("services", "what do you offer?", [1.0, 0.0], {"result": "answer"}, latency=2.5)
+
+    assert cache.get("services", [0.99, 0.05]) == {"result": "answer"}
+    assert cache.get("services", [0.7, 0.7]) is None
+    cache.invalidate("services")
+    assert cache.get("services", [1.0, 0.0]) is None
+    assert (cache.hits, cache.misses, cache.stats()["latency_saved_seconds"]) == (1, 2, 2.5)
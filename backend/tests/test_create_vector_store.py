@@ -0,0 +1,251 @@
+import pytest
+
+from langchain_core.documents import Document
+
+import create_vector_store
+from database import checkpoint_store, ingest_manifest
+from database.ingest_manifest import vector_id
+from utils.dedup import NearDuplicateFilter
+
+
+def fake_chunk_texts_parallel(texts, workers, requests_per_minute=14, **chunker_kwargs):
+    """Pulls texts lazily like the real pool and finishes them out of order; "fail" texts fail."""
+    pending = []
+    for position, text in enumerate(texts):
+        pending.append((position, text))
+        if len(pending) == 2:
+            position, text = pending.pop()  # Newest first
+            yield position, None if text == "fail" else [f"{text} chunk"]
+    while pending:
+        position, text = pending.pop()
+        yield position, None if text == "fail" else [f"{text} chunk"]
+
+
+def test_parallel_chunks_keep_their_source(monkeypatch):
+    monkeypatch.setattr(create_vector_store, "chunk_texts_parallel", fake_chunk_texts_parallel)
+    monkeypatch.setattr(create_vector_store, "load_document_chunks", lambda key: None)
+    monkeypatch.setattr(create_vector_store, "save_document_chunks", lambda key, chunks: None)
+
+    documents = [Document(page_content=f"doc{i}", metadata={"source": f"file{i}.txt"}) for i in range(5)]
+    documents.insert(2, Document(page_content="fail", metadata={"source": "broken.txt"}))
+    documents.append(Document(page_content="Question: q", metadata={"source": "qa.csv", "content_type": "qa_pair"}))
+
+    failed = set()
+    chunks = list(create_vector_store.iter_chunks(documents, workers=2, failed_sources=failed))
+
+    by_source = {chunk.metadata["source"]: chunk.page_content for chunk in chunks}
+    assert by_source == {
+        **{f"file{i}.txt": f"doc{i} chunk" for i in range(5)},
+        "qa.csv": "Question: q",
+    }
+    assert len(chunks) == 6
+    assert failed == {"broken.txt"}
+
+
+
+def test_serial_chunking_is_paced_by_llm_calls_not_by_documents(monkeypatch):
+    budgets = []
+
+    def fake_agentic_chunking(text, request_budget=None):
+        budgets.append(request_budget)
+        return [f"{text} chunk"]
+
+    def no_sleep(seconds):
+        raise AssertionError("serial chunking should only wait inside the request budget")
+
+    monkeypatch.setattr(create_vector_store, "agentic_chunking", fake_agentic_chunking)
+    monkeypatch.setattr(create_vector_store, "load_document_chunks", lambda key: None)
+    monkeypatch.setattr(create_vector_store, "save_document_chunks", lambda key, chunks: None)
+    monkeypatch.setattr(create_vector_store.time, "sleep", no_sleep)
+
+    documents = [Document(page_content=f"doc{i}", metadata={"source": f"file{i}.txt"}) for i in range(3)]
+    chunks = list(create_vector_store.iter_chunks(documents, workers=1))
+
+    assert [chunk.page_content for chunk in chunks] == ["doc0 chunk", "doc1 chunk", "doc2 chunk"]
+    assert budgets[0] is not None and all(budget is budgets[0] for budget in budgets)
+
+
+def test_failed_sources_keep_their_manifest_entry(monkeypatch):
+    recorded, deleted = [], []
+    monkeypatch.setattr(create_vector_store, "init_checkpoint_db", lambda: None)
+    monkeypatch.setattr(create_vector_store, "init_manifest_db", lambda: None)
+    monkeypatch.setattr(create_vector_store, "init_lexical_index", lambda: None)
+    monkeypatch.setattr(create_vector_store, "list_source_files", lambda directory: [])
+    monkeypatch.setattr(create_vector_store, "plan_ingestion", lambda files, index_name: (
+        {"good.txt": "new-hash", "broken.txt": "new-hash"},
+        {"good.txt": ["old-good"], "broken.txt": ["old-broken"]},
+    ))
+    monkeypatch.setattr(create_vector_store, "prepare_vector_store", lambda: None)
+    monkeypatch.setattr(create_vector_store, "get_manifest", lambda index_name: {})
+    monkeypatch.setattr(create_vector_store, "lexical_gaps", lambda index_name, manifest: [])
+    monkeypatch.setattr(create_vector_store, "run_ingestion_pipeline", lambda documents, vector_store, dedup_filter: (
+        {"good.txt", "broken.txt"}, {"good.txt": ["new-good"]}, {}, {"broken.txt"}
+    ))
+    monkeypatch.setattr(create_vector_store, "DEDUP_ENABLED", False)
+    monkeypatch.setattr(create_vector_store, "delete_vectors", deleted.extend)
+    monkeypatch.setattr(create_vector_store, "record_file", lambda source, *args, **kwargs: recorded.append(source))
+
+    create_vector_store.main()
+
+    assert recorded == ["good.txt"]
+    assert deleted == ["old-good"]
+
+
+def test_files_missing_from_the_keyword_index_are_backfilled(monkeypatch):
+    recorded, sources = [], []
+    monkeypatch.setattr(create_vector_store, "init_checkpoint_db", lambda: None)
+    monkeypatch.setattr(create_vector_store, "init_manifest_db", lambda: None)
+    monkeypatch.setattr(create_vector_store, "init_lexical_index", lambda: None)
+    monkeypatch.setattr(create_vector_store, "list_source_files", lambda directory: ["old.txt", "indexed.txt"])
+    monkeypatch.setattr(create_vector_store, "plan_ingestion", lambda files, index_name: ({}, {}))
+    monkeypatch.setattr(create_vector_store, "get_manifest", lambda index_name: {
+        "old.txt": ("old-hash", ["old-vector"], []),
+        "indexed.txt": ("indexed-hash", ["indexed-vector"], []),
+    })
+    monkeypatch.setattr(create_vector_store, "lexical_gaps", lambda index_name, manifest: ["old.txt"])
+    monkeypatch.setattr(create_vector_store, "iter_documents", lambda directory, sources: sorted(sources))
+    monkeypatch.setattr(create_vector_store, "prepare_vector_store", lambda: None)
+
+    def run_pipeline(documents, vector_store, dedup_filter):
+        sources.extend(documents)
+        return {"old.txt"}, {"old.txt": ["old-vector"]}, {}, set()
+
+    monkeypatch.setattr(create_vector_store, "run_ingestion_pipeline", run_pipeline)
+    monkeypatch.setattr(create_vector_store, "DEDUP_ENABLED", False)
+    monkeypatch.setattr(create_vector_store, "delete_vectors", lambda vector_ids: None)
+    monkeypatch.setattr(create_vector_store, "record_file", lambda source, content_hash, *args, **kwargs: recorded.append(
+        (source, content_hash)
+    ))
+
+    create_vector_store.main()
+
+    assert sources == ["old.txt"]
+    assert recorded == [("old.txt", "old-hash")]
+
+
+class RecordingVectorStore:
+    def __init__(self):
+        self.vectors = {}
+        self.upserted = []
+
+    def add_documents(self, documents, ids, embedding_chunk_size=None):
+        self.upserted.extend(ids)
+        self.vectors.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.vectors.pop(chunk_id, None)
+
+
+def use_temporary_checkpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(checkpoint_store, "CHECKPOINT_DB_PATH", str(tmp_path / "checkpoint.db"))
+    monkeypatch.setattr(create_vector_store, "add_chunks", lambda index_name, batch: None)
+    monkeypatch.setattr(create_vector_store, "PINECONE_INDEX_NAME", "services")
+    checkpoint_store.init_checkpoint_db()
+
+
+def test_resumed_upserts_skip_landed_chunks_whatever_the_batch_layout(monkeypatch, tmp_path):
+    use_temporary_checkpoint(monkeypatch, tmp_path)
+    chunks = [Document(page_content=f"chunk {i}", metadata={"source": "file.txt"}) for i in range(7)]
+    pairs = [(chunk, vector_id(chunk)) for chunk in chunks]
+    store = RecordingVectorStore()
+
+    monkeypatch.setattr(create_vector_store, "UPSERT_BATCH_SIZE", 2)
+    list(create_vector_store.upsert_batches(store, pairs[:4]))  # Interrupted after four chunks
+    monkeypatch.setattr(create_vector_store, "UPSERT_BATCH_SIZE", 3)
+    landed = list(create_vector_store.upsert_batches(store, list(reversed(pairs))))
+
+    assert len(landed) == 7
+    assert sorted(store.upserted) == sorted(chunk_id for _, chunk_id in pairs)
+
+
+def test_reverted_file_is_upserted_again(monkeypatch, tmp_path):
+    use_temporary_checkpoint(monkeypatch, tmp_path)
+    monkeypatch.setattr(ingest_manifest, "MANIFEST_DB_PATH", str(tmp_path / "manifest.db"))
+    dataset = tmp_path / "Dataset"
+    dataset.mkdir()
+    store = RecordingVectorStore()
+
+    class FakeLocalVectorStore:
+        @staticmethod
+        def load(index_name, embeddings=None):
+            return store
+
+    real_list_source_files, real_iter_documents = create_vector_store.list_source_files, create_vector_store.iter_documents
+    monkeypatch.setattr(create_vector_store, "list_source_files", lambda directory: real_list_source_files(str(dataset)))
+    monkeypatch.setattr(create_vector_store, "iter_documents", lambda directory, sources: real_iter_documents(
+        str(dataset), sources
+    ))
+    monkeypatch.setattr(create_vector_store, "init_lexical_index", lambda: None)
+    monkeypatch.setattr(create_vector_store, "delete_chunks", lambda index_name, vector_ids: None)
+    monkeypatch.setattr(create_vector_store, "lexical_gaps", lambda index_name, manifest: [])
+    monkeypatch.setattr(create_vector_store, "prepare_vector_store", lambda: store)
+    monkeypatch.setattr(create_vector_store, "VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setattr(create_vector_store, "LocalVectorStore", FakeLocalVectorStore)
+    monkeypatch.setattr(create_vector_store, "DEDUP_ENABLED", False)
+
+    def ingest(answer):
+        (dataset / "faq.csv").write_text(f"Question,Answer\nWhat is MSP?,{answer}\n", encoding="utf-8")
+        create_vector_store.main()
+        return set(store.vectors)
+
+    v1 = ingest("Managed services.")
+    v2 = ingest("Managed IT services.")
+    assert v1 and v2 and v1.isdisjoint(v2)
+    assert ingest("Managed services.") == v1
+
+
+def test_vector_ids_do_not_depend_on_where_the_checkout_lives(tmp_path):
+    chunk_text = "We offer managed cloud backups."
+    ids = []
+    for checkout in ("one", "two"):
+        root = tmp_path / checkout / "Dataset"
+        chunk = Document(page_content=chunk_text, metadata={"source": str(root / "Q&A" / "services.csv")})
+        ids.append(vector_id(chunk, root=str(root)))
+    assert ids[0] == ids[1]
+
+    other_file = Document(page_content=chunk_text, metadata={"source": str(root / "Q&A" / "pricing.csv")})
+    assert vector_id(other_file, root=str(root)) != ids[1]
+
+
+def test_pipeline_upserts_one_copy_of_chunks_repeated_across_files(monkeypatch, tmp_path):
+    use_temporary_checkpoint(monkeypatch, tmp_path)
+    monkeypatch.setattr(create_vector_store, "load_document_chunks", lambda key: None)
+    monkeypatch.setattr(create_vector_store, "save_document_chunks", lambda key, chunks: None)
+    answer = "Our managed service plan covers round the clock monitoring, patching and nightly backups of your servers."
+    documents = [
+        Document(page_content=answer, metadata={"source": "MSP.csv", "content_type": "qa_pair"}),
+        Document(
+            page_content="Kubernetes consulting covers cluster design.",
+            metadata={"source": "k8s.csv", "content_type": "qa_pair"},
+        ),
+        Document(page_content=answer, metadata={"source": "MSP copy.csv", "content_type": "qa_pair"}),
+    ]
+    store = RecordingVectorStore()
+
+    _, ids_by_source, duplicates_by_source, _ = create_vector_store.run_ingestion_pipeline(
+        documents, store, NearDuplicateFilter(threshold=0.8)
+    )
+
+    canonical_id = vector_id(documents[0])
+    assert len(store.upserted) == 2 and canonical_id in store.upserted
+    assert set(ids_by_source) == {"MSP.csv", "k8s.csv"}
+    assert duplicates_by_source == {"MSP copy.csv": [canonical_id]}
+
+
+class FailingVectorStore(RecordingVectorStore):
+    def add_documents(self, documents, ids, embedding_chunk_size=None):
+        raise RuntimeError("index is read-only")
+
+
+def test_a_failing_stage_stops_the_pipeline_with_its_error(monkeypatch, tmp_path):
+    use_temporary_checkpoint(monkeypatch, tmp_path)
+    monkeypatch.setattr(create_vector_store, "UPSERT_MAX_RETRIES", 0)
+    # Far more documents than the queues hold: returning at all means no stage was left blocked on a full queue
+    documents = (
+        Document(page_content=f"row {i}", metadata={"source": f"file{i}.csv", "content_type": "qa_pair"})
+        for i in range(500)
+    )
+
+    with pytest.raises(RuntimeError, match="read-only"):
+        create_vector_store.run_ingestion_pipeline(documents, FailingVectorStore(), queue_size=2)
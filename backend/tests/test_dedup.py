@@ -0,0 +1,41 @@
+from utils.dedup import NearDuplicateFilter
+
+FAQ_ANSWER = (
+    "Our managed service plan covers round the clock monitoring of your servers, patching of the operating "
+    "system, nightly backups with thirty day retention, and a dedicated engineer who reviews capacity every month."
+)
+
+
+def test_near_duplicates_from_other_sources_are_merged_into_the_first_chunk():
+    dedup = NearDuplicateFilter(threshold=0.8)
+    assert dedup.add("msp-1", FAQ_ANSWER, "Q&A/MSP.csv") is None
+
+    reworded = FAQ_ANSWER.replace("a dedicated engineer", "one dedicated engineer")
+    assert dedup.add("msp-2", reworded, "Botdata/Managed Service Provider.docx") == "msp-1"
+    assert dedup.add("msp-3", FAQ_ANSWER, "Q&A/MSP.csv") == "msp-1"
+
+    assert dedup.merged_sources() == {"msp-1": ["Botdata/Managed Service Provider.docx", "Q&A/MSP.csv"]}
+    report = dedup.report()
+    assert (report["chunks_seen"], report["chunks_kept"], report["duplicates_dropped"]) == (3, 1, 2)
+    assert report["groups"] == [
+        {"canonical": "msp-1", "duplicates": 2, "sources": ["Botdata/Managed Service Provider.docx", "Q&A/MSP.csv"]}
+    ]
+
+
+def test_distinct_chunks_are_all_kept():
+    dedup = NearDuplicateFilter(threshold=0.8)
+    texts = [
+        FAQ_ANSWER,
+        "Kubernetes consulting includes cluster design, autoscaling policies and upgrade planning for AKS and EKS.",
+        "We build native iOS and Android apps and publish them to the App Store and Google Play.",
+        "Our managed service plan covers monitoring.",
+    ]
+    assert [dedup.add(f"chunk-{i}", text, "file.txt") for i, text in enumerate(texts)] == [None] * len(texts)
+    assert dedup.merged_sources() == {}
+    assert dedup.report()["duplicates_dropped"] == 0
+
+
+def test_signatures_are_stable_across_filters():
+    # The manifest records which canonical vector each duplicate points at, so every run must dedup alike
+    first, second = NearDuplicateFilter(), NearDuplicateFilter()
+    assert (first.signature(FAQ_ANSWER) == second.signature(FAQ_ANSWER)).all()
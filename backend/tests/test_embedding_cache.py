@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import multiprocessing
+
+import fakeredis
+import numpy as np
+
+from utils.embedding_cache import EmbeddingCache, EmbeddingMemo
+
+
+def write_keys(directory, worker, count):
+    cache = EmbeddingCache(directory, dim=4, initial_capacity=8)
+    for i in range(count):
+        cache.put(f"{worker}-{i}", [worker, i, 0, 1])
+        cache.put("shared", [-1, -1, -1, -1])  # Every process races to store the same key
+
+
+def test_processes_sharing_a_directory_keep_every_vector(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=write_keys, args=(str(tmp_path), worker, 200)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), dim=4)
+    for worker in range(4):
+        for i in range(200):
+            assert np.array_equal(cache.get(f"{worker}-{i}"), [worker, i, 0, 1])
+    assert np.array_equal(cache.get("shared"), [-1, -1, -1, -1])
+    with open(tmp_path / "index.tsv") as f:
+        assert len(f.readlines()) == 4 * 200 + 1
+
+
+def test_a_reader_sees_vectors_written_by_another_process(tmp_path):
+    reader = EmbeddingCache(str(tmp_path), dim=4, initial_capacity=8)
+    assert reader.get("0-0") is None
+
+    process = multiprocessing.get_context("fork").Process(target=write_keys, args=(str(tmp_path), 0, 50))
+    process.start()
+    process.join()
+
+    assert np.array_equal(reader.get("0-49"), [0, 49, 0, 1])
+
+
+class RecordingBacking:
+    """Disk tier stand-in that records which thread touched it."""
+    def __init__(self):
+        self.vectors = {}
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return self.vectors.get(key)
+
+    def put(self, key, vector):
+        self.threads.add(threading.get_ident())
+        self.vectors[key] = vector
+
+
+def test_async_lookups_keep_tier_io_off_the_event_loop():
+    backing = RecordingBacking()
+    memo = EmbeddingMemo(max_entries=0, backing=backing)
+
+    async def compute(texts):
+        return [[float(len(text))] * 4 for text in texts]
+
+    async def run():
+        first = await memo.aget_or_compute("model", "retrieval_query", ["hello"], compute)
+        second = await memo.aget_or_compute("model", "retrieval_query", ["hello"], compute)
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(run())
+
+    assert first == second == [[5.0] * 4]
+    assert memo.disk_hits == 1
+    assert backing.threads and loop_thread not in backing.threads
+
+
+class CountingCompute:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0, 0.0, 0.0] for text in texts]
+
+
+def test_each_tier_fills_the_faster_ones(tmp_path):
+    redis_client = fakeredis.FakeStrictRedis()
+    compute = CountingCompute()
+    first = EmbeddingMemo(redis_client=redis_client, backing=EmbeddingCache(str(tmp_path), dim=4))
+    assert first.get_or_compute("model", "retrieval_query", ["hello", "hello"], compute) == [[5.0, 1.0, 0.0, 0.0]] * 2
+    assert compute.texts == ["hello"]
+
+    # Another worker sharing Redis finds it there, then in its own memory
+    second = EmbeddingMemo(redis_client=redis_client)
+    second.get_or_compute("model", "retrieval_query", ["hello"], compute)
+    second.get_or_compute("model", "retrieval_query", ["hello"], compute)
+    assert (second.redis_hits, second.memory_hits, second.misses) == (1, 1, 0)
+
+    # After Redis is flushed, a restarted process still has the disk tier
+    redis_client.flushall()
+    third = EmbeddingMemo(redis_client=redis_client, backing=EmbeddingCache(str(tmp_path), dim=4))
+    third.get_or_compute("model", "retrieval_query", ["hello"], compute)
+    assert (third.disk_hits, third.misses) == (1, 0)
+    assert redis_client.exists(f"embedding:{EmbeddingCache.make_key('model', 'retrieval_query', 'hello')}")
+    assert compute.texts == ["hello"]
+
+
+def test_task_type_and_model_are_part_of_the_key():
+    compute = CountingCompute()
+    memo = EmbeddingMemo()
+    memo.get_or_compute("model", "retrieval_query", ["hello"], compute)
+    memo.get_or_compute("model", "retrieval_document", ["hello"], compute)
+    memo.get_or_compute("other-model", "retrieval_query", ["hello"], compute)
+    assert compute.texts == ["hello"] * 3
+
+
+def test_memory_tier_evicts_the_least_recently_used():
+    compute = CountingCompute()
+    memo = EmbeddingMemo(max_entries=2)
+    memo.get_or_compute("model", "retrieval_query", ["a", "b"], compute)
+    memo.get_or_compute("model", "retrieval_query", ["a"], compute)  # "b" is now the oldest
+    memo.get_or_compute("model", "retrieval_query", ["c"], compute)
+    memo.get_or_compute("model", "retrieval_query", ["a", "b"], compute)
+    assert compute.texts == ["a", "b", "c", "b"]
+
+
+class BrokenRedis:
+    def mget(self, keys):
+        raise ConnectionError("redis is down")
+
+    def pipeline(self):
+        raise ConnectionError("redis is down")
+
+
+def test_an_unreachable_redis_tier_falls_back_to_computing():
+    compute = CountingCompute()
+    memo = EmbeddingMemo(redis_client=BrokenRedis())
+    assert memo.get_or_compute("model", "retrieval_query", ["hello"], compute) == [[5.0, 1.0, 0.0, 0.0]]
+    assert memo.get_or_compute("model", "retrieval_query", ["hello"], compute) == [[5.0, 1.0, 0.0, 0.0]]
+    assert compute.texts == ["hello"]
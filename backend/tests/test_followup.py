@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+
+import fakeredis
+import fakeredis.aioredis
+
+from main import followup
+
+
+def test_jobs_for_one_user_run_in_submission_order(monkeypatch):
+    monkeypatch.setattr(followup, "redis_client", fakeredis.FakeStrictRedis(decode_responses=True))
+    ran = []
+    done = threading.Event()
+
+    def run_job(job_id, email, query, response, context, translate):
+        time.sleep(0.01 if query == "first" else 0)  # The first job is the slowest
+        ran.append((email, query))
+        if len(ran) == 6:
+            done.set()
+
+    monkeypatch.setattr(followup, "_run_followup_job", run_job)
+    for query in ["first", "second", "third"]:
+        for email in ["a@example.com", "b@example.com"]:
+            followup.submit_followups(email, query, "answer")
+
+    assert done.wait(5)
+    for email in ["a@example.com", "b@example.com"]:
+        assert [query for user, query in ran if user == email] == ["first", "second", "third"]
+    time.sleep(0.05)
+    assert followup._user_queues == {}  # Drained users are forgotten
+
+
+def test_async_jobs_for_one_user_run_in_submission_order(monkeypatch):
+    monkeypatch.setattr(followup, "async_redis_client", fakeredis.aioredis.FakeRedis(decode_responses=True))
+    ran = []
+
+    async def run_job(job_id, email, query, response, context, translate):
+        await asyncio.sleep(0.01 if query == "first" else 0)
+        ran.append(query)
+
+    monkeypatch.setattr(followup, "_arun_followup_job", run_job)
+
+    async def run():
+        for query in ["first", "second", "third"]:
+            await followup.asubmit_followups("a@example.com", query, "answer")
+        while followup._background_tasks:
+            await asyncio.gather(*followup._background_tasks)
+
+    asyncio.run(run())
+    assert ran == ["first", "second", "third"]
+    assert followup._async_user_queues == {}
+
+
+class RecordingIndex:
+    def __init__(self):
+        self.queries = []
+
+    def query(self, vector, top_k, include_metadata):
+        self.queries.append(vector)
+        return {"matches": [{"metadata": {"text": f"looked up for {vector[0]:.0f}"}}]}
+
+
+def test_followups_reuse_stored_context_and_only_search_for_the_rest(monkeypatch):
+    monkeypatch.setattr(followup, "redis_client", fakeredis.FakeStrictRedis(decode_responses=True))
+    index = RecordingIndex()
+    embedded = []
+    monkeypatch.setattr(followup, "get_search_index", lambda index_name: index)
+    monkeypatch.setattr(followup, "get_embeddings_batch", lambda texts: embedded.append(list(texts)) or [
+        [float(len(text))] for text in texts
+    ])
+
+    followup.store_conversation_redis("user@example.com", "first", "answer 1")
+    followup.store_conversation_redis("user@example.com", "What is MSP?", "answer 2", context=["MSP doc"])
+    followup.store_conversation_redis("user@example.com", "Pricing?", "answer 3", context=["Pricing doc"])
+    followup.store_conversation_redis("user@example.com", "and support", "answer 4")
+
+    conversations = followup.get_last_three_conversations("user@example.com")
+    assert [conversation["query"] for conversation in conversations] == ["What is MSP?", "Pricing?", "and support"]
+
+    context = followup.get_relevant_context(conversations)
+
+    assert context == ["MSP doc", "Pricing doc", "looked up for 11"]
+    assert embedded == [["and support"]]
+    assert len(index.queries) == 1
@@ -0,0 +1,88 @@
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableLambda
+
+from agents import faq_agent
+from main import utils as main_utils
+from utils import memory
+
+
+class StaticRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return [Document(page_content="Our support desk answers tickets within four hours.")]
+
+
+class StaticVectorStore:
+    def as_retriever(self, **kwargs):
+        return StaticRetriever()
+
+
+class StructuredLLM:
+    """Stands in for the Gemini client; records the prompt and returns a fixed structured answer."""
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    def with_structured_output(self, schema):
+        def respond(prompt):
+            self.prompts.append(prompt)
+            return schema(**self.answer)
+        return RunnableLambda(respond)
+
+
+def build_chain(monkeypatch, answer):
+    llm = StructuredLLM(answer)
+    monkeypatch.setattr(main_utils, "get_llm", lambda **kwargs: llm)
+    monkeypatch.setattr(main_utils, "hybrid_retriever", lambda retriever, index_name, k: retriever)
+    return main_utils.create_fused_faq_chain(StaticVectorStore(), index_name="faq"), llm
+
+
+def test_one_call_answers_and_labels_the_message(monkeypatch):
+    chain, llm = build_chain(monkeypatch, {"answer": "We reply within four hours.", "intent": "complaint", "escalate": False})
+    payload = {"query": "User: my ticket is ignored", "message": "my ticket is ignored", "history": "User: hi\nBot: hello"}
+
+    result = chain.invoke(payload)
+    async_result = asyncio.run(chain.ainvoke(payload))
+
+    assert result == async_result
+    assert {key: result[key] for key in ("answer", "intent", "escalate")} == {
+        "answer": "We reply within four hours.", "intent": "complaint", "escalate": False
+    }
+    assert "route" not in result
+    assert [doc.page_content for doc in result["source_documents"]] == ["Our support desk answers tickets within four hours."]
+    assert len(llm.prompts) == 2
+    assert "answers tickets within four hours" in llm.prompts[0]
+    assert "User: hi\nBot: hello" in llm.prompts[0] and "my ticket is ignored" in llm.prompts[0]
+
+
+def no_second_call(*args, **kwargs):
+    raise AssertionError("the fused answer already carries the intent")
+
+
+def test_faq_agent_uses_the_fused_answer_without_more_llm_calls(monkeypatch):
+    monkeypatch.setattr(memory, "session_memories", {})
+    monkeypatch.setattr(faq_agent, "detect_intent_gemini", no_second_call)
+    monkeypatch.setattr(faq_agent, "invoke_qa_chain", no_second_call)
+    agent = faq_agent.get_faq_agent()
+    fused = {"answer": "Sorry about that.", "intent": "complaint", "escalate": False, "source_documents": []}
+
+    result = agent.invoke({"query": "The dashboard is down", "email": "user@example.com", "fused": fused})
+
+    assert result["intent"] == "complaint" and not result["escalate"]
+    assert result["result"].startswith("Sorry about that.")
+    assert [turn["intent"] for turn in memory.get_memory_for_user("user@example.com")] == ["complaint", "complaint"]
+
+
+def test_fused_escalation_flag_confirms_without_rechecking_history(monkeypatch):
+    monkeypatch.setattr(memory, "session_memories", {})
+    monkeypatch.setattr(faq_agent, "detect_intent_gemini", no_second_call)
+    monkeypatch.setattr(faq_agent, "adetect_intent_gemini", no_second_call)
+    memory.add_to_memory("user@example.com", "The dashboard is down", "Would you like further assistance?")  # Unlabelled
+    agent = faq_agent.get_faq_agent()
+    fused = {"answer": "Sure.", "intent": "affirmation", "escalate": True, "source_documents": []}
+
+    result = asyncio.run(agent.ainvoke({"query": "yes please", "email": "user@example.com", "fused": fused}))
+
+    assert result["escalate"] and result["intent"] == "affirmation"
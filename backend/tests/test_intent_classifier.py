@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from agents import router_agent
+from utils.intent_classifier import INTENT_CLASSIFIER_THRESHOLD, IntentClassifier, load_dataset_questions
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "Dataset")
+
+# Held out from training: the threshold must keep every complaint away from a confident 'service'
+HELD_OUT_COMPLAINTS = [
+    "Why is the cloud IT support response slow during a critical issue?",
+    "Why is my cloud bill so high?",
+    "Your MSP team cannot provide 24/7 support for us",
+    "Our Kubernetes cluster keeps crashing.",
+    "I have been overcharged for cloud usage.",
+    "The mobile app you built doesn't open on Android.",
+    "Nobody from support has called me back.",
+    "The test automation runs keep timing out.",
+    "Why does my website keep going offline?",
+    "The migration took our site down for hours.",
+    "I want a refund, the app still has bugs.",
+    "Our database backups stopped working.",
+]
+HELD_OUT_SERVICES = [
+    "What does your cloud migration service include?",
+    "Do you offer Kubernetes training?",
+    "How much does app development cost?",
+    "Can you build a web app for my business?",
+    "What DevOps tools do you use?",
+    "Do you provide 24/7 managed support?",
+    "How do you handle data security in the cloud?",
+    "Can you help us move to microservices?",
+    "Do you develop apps for wearables?",
+    "What testing frameworks does your platform support?",
+    "Can you manage our AWS and Azure accounts?",
+    "How do you price managed IT services?",
+]
+
+
+@pytest.fixture(scope="module")
+def router_classifier():
+    original = router_agent.load_dataset_questions
+    router_agent.load_dataset_questions = lambda: load_dataset_questions(DATASET_DIR)
+    try:
+        classifier = router_agent._build_router_classifier()
+    finally:
+        router_agent.load_dataset_questions = original
+    assert classifier is not None
+    return classifier
+
+
+def test_problem_phrased_dataset_entries_are_not_service_examples():
+    assert not router_agent._is_service_question("Why do users get unexpected high cloud bills?")
+    assert not router_agent._is_service_question("We can’t ensure 24/7 IT support with our internal resources.")
+    assert not router_agent._is_service_question("We need a reliable partner to manage our IT end-to-end.")
+    assert router_agent._is_service_question("Can you train my team to manage Kubernetes in-house?")
+
+
+def test_threshold_never_confidently_routes_held_out_complaints_to_service(router_classifier):
+    assert router_classifier.threshold == INTENT_CLASSIFIER_THRESHOLD
+    for query in HELD_OUT_COMPLAINTS:
+        assert router_classifier.predict(query) in ("complaint", None), query
+
+
+def test_threshold_still_answers_most_held_out_service_queries_locally(router_classifier):
+    predictions = [router_classifier.predict(query) for query in HELD_OUT_SERVICES]
+    assert "complaint" not in predictions
+    assert predictions.count("service") >= len(HELD_OUT_SERVICES) * 3 // 4
+
+
+def test_low_confidence_predictions_fall_back_and_are_counted():
+    classifier = IntentClassifier(
+        {"service": ["What services do you offer?"], "complaint": ["The website is down."]}, threshold=0.99
+    )
+    assert classifier.predict("Tell me something") is None
+    classifier.threshold = 0.0
+    assert classifier.predict("What services do you offer?") == "service"
+    stats = classifier.stats()
+    assert (stats["local_hits"], stats["llm_fallbacks"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def test_classify_intent_locally_uses_the_shared_classifier(monkeypatch, router_classifier):
+    monkeypatch.setattr(router_agent, "get_router_classifier", lambda: router_classifier)
+    assert router_agent.classify_intent_locally("Our database backups stopped working.") == "complaint"
+    assert router_agent.classify_intent_locally("Do you offer Kubernetes training?") == "service"
+
+
+def test_classify_intent_locally_is_none_when_the_classifier_is_off(monkeypatch):
+    monkeypatch.setattr(router_agent, "INTENT_CLASSIFIER_ENABLED", False)
+    assert router_agent.classify_intent_locally("Do you offer Kubernetes training?") is None
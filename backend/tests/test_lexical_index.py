@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils import lexical_index
+
+
+class CountingRetriever(BaseRetriever):
+    calls: int = 0
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        self.calls += 1
+        return [Document(page_content="from vector search")]
+
+
+def build_index(path):
+    lexical_index.init_lexical_index(path)
+    chunks = [(Document(page_content=f"We offer cloud services for team {i}."), f"id-{i}") for i in range(60)]
+    chunks.append((Document(page_content="Our MSP plan manages your servers around the clock."), "id-msp"))
+    lexical_index.add_chunks("services", chunks, path)
+    return {"Dataset/services.csv": ("hash", [chunk_id for _, chunk_id in chunks], [])}
+
+
+def test_only_rare_keywords_make_a_strong_match(tmp_path):
+    path = str(tmp_path / "lexical.db")
+    build_index(path)
+
+    _, strong = lexical_index.keyword_search("services", "What services do you offer?", 4, path)
+    assert not strong
+
+    results, strong = lexical_index.keyword_search("services", "Tell me about MSP", 4, path)
+    assert strong
+    assert [doc.page_content for doc, _ in results] == ["Our MSP plan manages your servers around the clock."]
+
+    _, strong = lexical_index.keyword_search("services", "Is the MSP plan unbreakable?", 4, path)
+    assert not strong  # "unbreakable" is in no chunk, so keywords alone can't answer it
+
+
+def test_vector_search_is_skipped_only_when_the_index_covers_the_manifest(tmp_path, monkeypatch):
+    path = str(tmp_path / "lexical.db")
+    manifest = build_index(path)
+    monkeypatch.setattr(lexical_index, "_coverage", {})
+    monkeypatch.setattr(lexical_index, "get_index_version", lambda index_name: len(manifest))
+    monkeypatch.setattr(lexical_index, "get_manifest", lambda index_name: manifest)
+    vector = CountingRetriever()
+    retriever = lexical_index.HybridRetriever(vector_retriever=vector, index_name="services", k=4, path=path)
+
+    follow_up = "User: Tell me about MSP\nBot: It manages your servers.\nUser: what about cloud?"
+    documents = retriever.invoke(follow_up)
+    assert vector.calls == 0
+    assert documents[0].page_content.startswith("Our MSP plan")
+
+    manifest["Dataset/new.csv"] = ("hash", ["id-not-indexed"], [])
+    assert lexical_index.lexical_gaps("services", manifest, path) == ["Dataset/new.csv"]
+    retriever.invoke(follow_up)
+    assert vector.calls == 1
+
+
+def test_async_retrieval_keeps_sqlite_lookups_off_the_event_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "lexical.db")
+    manifest = build_index(path)
+    threads = set()
+
+    def recording(function):
+        def wrapper(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return function(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(lexical_index, "_coverage", {})
+    monkeypatch.setattr(lexical_index, "get_index_version", lambda index_name: len(manifest))
+    monkeypatch.setattr(lexical_index, "get_manifest", lambda index_name: manifest)
+    monkeypatch.setattr(lexical_index, "keyword_search", recording(lexical_index.keyword_search))
+    monkeypatch.setattr(lexical_index, "covers_manifest", recording(lexical_index.covers_manifest))
+    retriever = lexical_index.HybridRetriever(vector_retriever=CountingRetriever(), index_name="services", k=4, path=path)
+
+    async def run():
+        documents = await retriever.ainvoke("Tell me about MSP")
+        return documents, threading.get_ident()
+
+    documents, loop_thread = asyncio.run(run())
+
+    assert documents[0].page_content.startswith("Our MSP plan")
+    assert retriever.vector_retriever.calls == 0  # Served lexically, so covers_manifest ran too
+    assert threads and loop_thread not in threads
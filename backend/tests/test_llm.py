@@ -0,0 +1,16 @@
+from utils import resources
+from utils.llm import get_llm
+
+
+def test_clients_are_pooled_per_configuration(monkeypatch):
+    monkeypatch.setattr(resources, "_resources", {})
+    monkeypatch.setattr(resources, "_locks", {})
+
+    first = get_llm(model="gemini-2.0-flash", temperature=0.5, google_api_key="test-key")
+    again = get_llm(model="gemini-2.0-flash", temperature=0.5, google_api_key="test-key")
+    cooler = get_llm(model="gemini-2.0-flash", temperature=0.0, google_api_key="test-key")
+    tagged = get_llm(model="gemini-2.0-flash", temperature=0.5, google_api_key="test-key", tags=["answer"])
+
+    assert first is again
+    assert cooler is not first and tagged is not first
+    assert cooler.temperature == 0.0 and tagged.tags == ["answer"]
@@ -0,0 +1,73 @@
+import pickle
+import itertools
+
+from agentic_chunker import AgenticChunker
+from utils import llm_cache
+from utils.llm_cache import LLMResponseCache
+
+
+def test_responses_are_keyed_on_model_prompt_and_generation_config(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"))
+    cache.put("gemini-2.0-flash", "Summarize chunk 1", "A summary", {"temperature": 0})
+
+    assert cache.get("gemini-2.0-flash", "Summarize chunk 1", {"temperature": 0}) == "A summary"
+    assert cache.get("gemini-2.0-flash", "Summarize chunk 1", {"temperature": 1}) is None
+    assert cache.get("gemini-1.5-flash", "Summarize chunk 1", {"temperature": 0}) is None
+    assert cache.get("gemini-2.0-flash", "Summarize chunk 2", {"temperature": 0}) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_least_recently_used_responses_are_evicted_first(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: next(clock))
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"), max_bytes=20)
+    cache.put("model", "first", "x" * 8)
+    cache.put("model", "second", "y" * 8)
+    cache.get("model", "first")  # Now more recent than "second"
+
+    cache.put("model", "third", "z" * 8)
+
+    assert cache.get("model", "first") == "x" * 8
+    assert cache.get("model", "second") is None
+    assert cache.get("model", "third") == "z" * 8
+
+
+def test_read_only_cache_serves_but_never_writes(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    LLMResponseCache(path).put("model", "prompt", "stored")
+    read_only = pickle.loads(pickle.dumps(LLMResponseCache(path, read_only=True)))  # As handed to a chunking worker
+
+    read_only.put("model", "other prompt", "dropped")
+
+    assert read_only.get("model", "prompt") == "stored"
+    assert read_only.get("model", "other prompt") is None
+
+
+class CountingBudget:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+
+def test_chunker_cache_hits_skip_the_model_and_the_request_budget(tmp_path, monkeypatch):
+    budget = CountingBudget()
+    chunker = AgenticChunker(gemini_api_key="test-key", request_budget=budget,
+                             response_cache=LLMResponseCache(str(tmp_path / "llm_cache.db")))
+    prompts = []
+    monkeypatch.setattr(chunker.model, "generate_content", lambda prompt, generation_config=None: (
+        prompts.append(prompt) or Response(f"answer to {prompt}")
+    ))
+
+    first = chunker._make_api_call("Title for: cloud migration")
+    second = chunker._make_api_call("Title for: cloud migration")
+
+    assert first == second == "answer to Title for: cloud migration"
+    assert prompts == ["Title for: cloud migration"]
+    assert budget.acquired == 1
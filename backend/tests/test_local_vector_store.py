@@ -0,0 +1,61 @@
+from langchain_core.embeddings import Embeddings
+
+from utils.local_vector_store import LocalVectorStore
+
+TOPICS = ["cloud", "kubernetes", "mobile", "testing"]
+
+
+class TopicEmbeddings(Embeddings):
+    """One dimension per topic word, so the nearest neighbour is obvious."""
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(topic in text.lower()) + 0.01 for topic in TOPICS]
+
+
+def open_store(tmp_path):
+    return LocalVectorStore(str(tmp_path / "services"), TopicEmbeddings(), dim=len(TOPICS))
+
+
+def test_upserts_overwrite_by_id_and_survive_reopening(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(["Cloud migration", "Kubernetes clusters"], metadatas=[{"category": "cloud"}, {"category": "k8s"}],
+                    ids=["a", "b"])
+    store.add_texts(["Mobile apps for iOS"], metadatas=[{"category": "mobile"}], ids=["a"])
+
+    reopened = open_store(tmp_path)
+    results = reopened.similarity_search_with_score("Do you build mobile apps?", k=2)
+
+    assert [doc.page_content for doc, _ in results] == ["Mobile apps for iOS", "Kubernetes clusters"]
+    assert results[0][0].metadata == {"category": "mobile"}
+    assert results[0][1] > results[1][1]
+
+
+def test_filter_delete_and_metadata_updates(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(["Cloud migration", "Cloud testing", "Kubernetes clusters"],
+                    metadatas=[{"category": "cloud"}, {"category": "testing"}, {"category": "k8s"}], ids=["a", "b", "c"])
+
+    only_testing = store.similarity_search("cloud", k=3, filter={"category": "testing"})
+    assert [doc.page_content for doc in only_testing] == ["Cloud testing"]
+
+    store.delete(["a"])
+    store.update_metadata({"b": {"sources": ["one.csv", "two.csv"]}, "missing": {"sources": []}})
+    reopened = open_store(tmp_path)
+    assert [doc.page_content for doc in reopened.similarity_search("cloud", k=3)] == ["Cloud testing", "Kubernetes clusters"]
+    assert reopened.similarity_search("cloud", k=1)[0].metadata == {"category": "testing", "sources": ["one.csv", "two.csv"]}
+
+
+def test_pinecone_style_query_returns_text_in_metadata(tmp_path):
+    store = open_store(tmp_path)
+    store.add_texts(["Kubernetes clusters"], metadatas=[{"category": "k8s"}], ids=["c"])
+
+    result = store.query(TopicEmbeddings().embed_query("kubernetes"), top_k=3)
+
+    assert [match["id"] for match in result["matches"]] == ["c"]
+    assert result["matches"][0]["metadata"] == {"category": "k8s", "text": "Kubernetes clusters"}
+
+
+def test_an_empty_store_returns_nothing(tmp_path):
+    assert open_store(tmp_path).similarity_search("cloud") == []
@@ -0,0 +1,26 @@
+from agents import service_recommender
+from utils import memory
+
+
+def test_build_context_keeps_bot_replies(monkeypatch):
+    monkeypatch.setattr(memory, "session_memories", {})
+    memory.add_to_memory("user@example.com", "What is MSP?", "Managed services.", intent="general")
+    for i in range(3):
+        memory.add_to_memory("user@example.com", f"question {i}", f"answer {i}")
+
+    context = memory.build_context("user@example.com", "What about cloud?")
+
+    assert context == (
+        "User: question 0\nBot: answer 0\n"
+        "User: question 1\nBot: answer 1\n"
+        "User: question 2\nBot: answer 2\n"
+        "User: What about cloud?"
+    )
+
+
+def test_service_turns_use_the_turn_intent_labels(monkeypatch):
+    monkeypatch.setattr(memory, "session_memories", {})
+    service_recommender._service_response("user@example.com", "What is MSP?", {"result": "Managed services."})
+
+    turn = memory.get_memory_for_user("user@example.com")[-1]
+    assert turn["intent"] in memory.TURN_INTENTS
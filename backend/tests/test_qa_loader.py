@@ -0,0 +1,52 @@
+import pytest
+
+from utils.qa_loader import load_qa_csv
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_each_row_becomes_one_qa_document(tmp_path):
+    path = write(tmp_path / "Cloud_Migration.csv", (
+        "Question,Answer\n"
+        "How long does a migration take?,\"Usually two to six weeks, depending on scope.\"\n"
+        "\n"
+        "Do you migrate databases?,Yes.\n"
+    ))
+
+    documents = load_qa_csv(path)
+
+    assert [doc.page_content for doc in documents] == [
+        "Question: How long does a migration take?\nAnswer: Usually two to six weeks, depending on scope.",
+        "Question: Do you migrate databases?\nAnswer: Yes.",
+    ]
+    assert documents[0].metadata == {"source": path, "row": 0, "category": "Cloud Migration", "content_type": "qa_pair"}
+    assert documents[1].metadata["row"] == 2  # Blank rows are skipped but keep their position
+
+
+def test_a_title_line_above_the_header_becomes_the_category(tmp_path):
+    path = write(tmp_path / "services.csv", "Kubernetes Services,\nService,Description\nAKS,Managed clusters on Azure\n")
+
+    documents = load_qa_csv(path)
+
+    assert documents[0].metadata["category"] == "Kubernetes Services"
+    assert documents[0].page_content == "Service: AKS\nDescription: Managed clusters on Azure"
+
+
+def test_unquoted_commas_stay_in_the_question(tmp_path):
+    path = write(tmp_path / "k8s.csv", "Question,Answer\nWhich platform (AKS, EKS or GKE) should I pick?,We help you choose.\n")
+
+    documents = load_qa_csv(path)
+
+    assert documents[0].page_content == (
+        "Question: Which platform (AKS, EKS or GKE) should I pick?\nAnswer: We help you choose."
+    )
+
+
+def test_a_file_without_a_header_is_rejected(tmp_path):
+    path = write(tmp_path / "empty.csv", "just a title\n\n")
+
+    with pytest.raises(ValueError):
+        load_qa_csv(path)
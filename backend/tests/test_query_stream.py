@@ -0,0 +1,78 @@
+import json
+
+from flask import Flask
+from langchain_core.messages import AIMessageChunk
+
+from main import routes
+from main.utils import ANSWER_STREAM_TAG
+
+
+class FakeFlow:
+    def __init__(self, events=None, error=None):
+        self.events = events or []
+        self.error = error
+
+    def stream(self, state, stream_mode):
+        assert stream_mode == ["messages", "values"]
+        yield from self.events
+        if self.error:
+            raise self.error
+
+
+class BrokenChain:
+    def invoke(self, inputs):
+        raise RuntimeError("vector store unavailable")
+
+
+async def english(text):
+    return "en"
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def stream(monkeypatch, flow, followups=("What about pricing?",)):
+    monkeypatch.setattr(routes, "get_langgraph_flow", lambda: flow)
+    monkeypatch.setattr(routes, "get_service_qa_chain", BrokenChain)
+    monkeypatch.setattr(routes, "detect_language", english)
+    monkeypatch.setattr(routes, "submit_followups", lambda *args: "job-1")
+    monkeypatch.setattr(routes, "wait_for_followup_job", lambda job_id, timeout: {"followups": list(followups)})
+    app = Flask(__name__)
+    app.register_blueprint(routes.main)
+    response = app.test_client().post(
+        "/query/stream", json={"user_id": "1", "email": "user@example.com", "query": "What do you offer?"}
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/event-stream")
+    return parse_events(response.get_data(as_text=True))
+
+
+def test_answer_tokens_stream_before_the_final_events(monkeypatch):
+    flow = FakeFlow([
+        ("messages", (AIMessageChunk(content="intent: service"), {"tags": []})),  # Router output, not the answer
+        ("messages", (AIMessageChunk(content="We offer "), {"tags": [ANSWER_STREAM_TAG]})),
+        ("messages", (AIMessageChunk(content="cloud services."), {"tags": [ANSWER_STREAM_TAG]})),
+        ("values", {"response": "We offer cloud services.", "intent": "service", "source_documents": []}),
+    ])
+
+    events = stream(monkeypatch, flow)
+
+    assert events == [
+        ("token", {"text": "We offer "}),
+        ("token", {"text": "cloud services."}),
+        ("answer", {"email": "user@example.com", "answer": "We offer cloud services."}),
+        ("metadata", {"intent": "service", "escalate": False, "awaiting_details": False}),
+        ("followups", {"followups_id": "job-1", "followups": ["What about pricing?"]}),
+        ("done", {}),
+    ]
+
+
+def test_a_failed_graph_and_fallback_end_the_stream_with_an_error(monkeypatch):
+    events = stream(monkeypatch, FakeFlow(error=RuntimeError("graph failed")))
+
+    assert events == [("error", {"error": "vector store unavailable"}), ("done", {})]
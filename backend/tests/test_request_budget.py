@@ -0,0 +1,63 @@
+import multiprocessing
+
+import pytest
+
+from utils import request_budget
+from utils.request_budget import RequestBudget
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.waits = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.waits.append(round(seconds, 3))
+        self.now += seconds
+
+
+def test_requests_beyond_the_limit_wait_for_the_oldest_slot(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(request_budget.time, "time", clock.time)
+    monkeypatch.setattr(request_budget.time, "sleep", clock.sleep)
+    budget = RequestBudget(3, period=60)
+
+    for _ in range(3):
+        budget.acquire()
+        clock.now += 10
+    assert clock.waits == []
+
+    budget.acquire()  # The first slot was claimed 30 seconds ago
+    assert clock.waits == [30.0]
+    budget.acquire()  # The second frees 10 seconds later
+    assert clock.waits == [30.0, 10.0]
+
+
+def acquire_twice(budget):
+    budget.acquire()
+    budget.acquire()
+
+
+class WouldWait(Exception):
+    pass
+
+
+def test_one_budget_caps_every_worker_process_together(monkeypatch):
+    budget = RequestBudget(4, period=60)
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=acquire_twice, args=(budget,)) for _ in range(2)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    def would_wait(seconds):
+        raise WouldWait(seconds)
+
+    monkeypatch.setattr(request_budget.time, "sleep", would_wait)
+    with pytest.raises(WouldWait):
+        budget.acquire()  # The workers used all four slots between them
@@ -0,0 +1,36 @@
+import threading
+
+from utils import resources
+
+
+def test_concurrent_first_uses_build_a_resource_once(monkeypatch):
+    monkeypatch.setattr(resources, "_resources", {})
+    monkeypatch.setattr(resources, "_locks", {})
+    builds = []
+    release = threading.Event()
+
+    def factory():
+        builds.append(threading.get_ident())
+        release.wait(1)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(resources.get_resource("chain", factory))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len({id(result) for result in results}) == 1
+
+
+def test_a_failed_build_is_retried_on_the_next_call(monkeypatch):
+    monkeypatch.setattr(resources, "_resources", {})
+    monkeypatch.setattr(resources, "_locks", {})
+    attempts = iter([None, "vector store"])
+
+    assert resources.get_resource("vector_store:services", lambda: next(attempts)) is None
+    assert resources.get_resource("vector_store:services", lambda: next(attempts)) == "vector store"
+    assert resources.get_resource("vector_store:services", lambda: "rebuilt") == "vector store"
@@ -0,0 +1,181 @@
+import os
+import copy
+import asyncio
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from dotenv import load_dotenv
+from database.ingest_manifest import get_index_version
+from utils.resources import get_resource, get_shared_embeddings
+
+load_dotenv()
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "True") == "True"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))  # Cosine similarity needed for a hit
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))  # Seconds an answer stays valid
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))  # Per namespace
+
+class SemanticAnswerCache:
+    """
+    In-process cache of QA chain results keyed on the embedding of the query.
+    A lookup returns the stored result of the most similar earlier query when the
+    cosine similarity reaches `threshold`. Entries live in one namespace per index,
+    expire after `ttl` seconds, and the least recently used are evicted beyond
+    `max_entries`. A namespace is cleared when its index version changes, i.e.
+    after the knowledge base has been re-ingested. Results are deep-copied on the
+    way in and out, so callers can't modify a cached entry.
+    """
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 version_source=get_index_version):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_source = version_source
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self._lock = threading.Lock()
+        self._namespaces = {}
+
+    def _namespace(self, name):
+        version = self.version_source(name)
+        namespace = self._namespaces.get(name)
+        if namespace is None or namespace["version"] != version:
+            namespace = {"version": version, "entries": OrderedDict(), "matrix": None, "keys": []}
+            self._namespaces[name] = namespace
+        return namespace
+
+    def _matrix(self, namespace):
+        if namespace["matrix"] is None:
+            namespace["keys"] = list(namespace["entries"])
+            vectors = [namespace["entries"][key]["vector"] for key in namespace["keys"]]
+            namespace["matrix"] = np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return namespace["matrix"]
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(self, name, vector):
+        """Return the cached result for a query vector, or None."""
+        vector = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            namespace = self._namespace(name)
+            entries = namespace["entries"]
+            expired = [key for key, entry in entries.items() if now - entry["created"] > self.ttl]
+            for key in expired:
+                del entries[key]
+            if expired:
+                namespace["matrix"] = None
+
+            matrix = self._matrix(namespace)
+            if len(matrix):
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = namespace["keys"][best]
+                    entries.move_to_end(key)
+                    self.hits += 1
+                    self.latency_saved += entries[key]["latency"]
+                    return copy.deepcopy(entries[key]["result"])
+            self.misses += 1
+            return None
+
+    def put(self, name, query, vector, result, latency):
+        """Store a result along with how long it took to produce."""
+        with self._lock:
+            namespace = self._namespace(name)
+            entries = namespace["entries"]
+            entries[query] = {
+                "vector": self._normalize(vector), "result": copy.deepcopy(result), "latency": latency, "created": time.time()
+            }
+            entries.move_to_end(query)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            namespace["matrix"] = None
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._namespaces.clear()
+            else:
+                self._namespaces.pop(name, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "latency_saved_seconds": round(self.latency_saved, 3),
+            "entries": {name: len(namespace["entries"]) for name, namespace in self._namespaces.items()},
+        }
+
+def get_answer_cache():
+    """Return the process-wide SemanticAnswerCache, or None when ANSWER_CACHE_ENABLED is off."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    return get_resource("answer_cache", SemanticAnswerCache)
+
+def _run_qa_chain(qa_chain, query, documents):
+    if documents is None:
+        return qa_chain.invoke({"query": query})
+    # Documents were already retrieved (speculatively, while routing); only the answer step runs
+    chain = qa_chain.combine_documents_chain
+    answer = chain.invoke({"input_documents": documents, "question": query})
+    return {"query": query, "result": answer[chain.output_key], "source_documents": documents}
+
+async def _arun_qa_chain(qa_chain, query, documents):
+    if documents is None:
+        return await qa_chain.ainvoke({"query": query})
+    chain = qa_chain.combine_documents_chain
+    answer = await chain.ainvoke({"input_documents": documents, "question": query})
+    return {"query": query, "result": answer[chain.output_key], "source_documents": documents}
+
+def invoke_qa_chain(qa_chain, index_name, query, documents=None, use_cache=True):
+    """
+    Run `qa_chain` on `query`, serving semantically similar repeat queries from the answer cache.
+    `documents`, when given, are used instead of the chain's own retrieval. Answers that depend on
+    who is asking should pass use_cache=False, since cached results are shared by every user.
+    """
+    cache = get_answer_cache() if use_cache else None
+    if cache is None:
+        return _run_qa_chain(qa_chain, query, documents)
+    try:
+        vector = get_shared_embeddings().embed_query(query)
+    except Exception as e:
+        print(f"⚠️ Answer cache lookup skipped, embedding failed: {e}")
+        return _run_qa_chain(qa_chain, query, documents)
+
+    result = cache.get(index_name, vector)
+    if result is not None:
+        print(f"[Answer Cache] Hit for: {query!r}")
+        return result
+    start = time.perf_counter()
+    result = _run_qa_chain(qa_chain, query, documents)
+    cache.put(index_name, query, vector, result, time.perf_counter() - start)
+    return result
+
+async def ainvoke_qa_chain(qa_chain, index_name, query, documents=None, use_cache=True):
+    """Async variant of invoke_qa_chain for the asyncio request path."""
+    cache = get_answer_cache() if use_cache else None
+    if cache is None:
+        return await _arun_qa_chain(qa_chain, query, documents)
+    try:
+        vector = await get_shared_embeddings().aembed_query(query)
+    except Exception as e:
+        print(f"⚠️ Answer cache lookup skipped, embedding failed: {e}")
+        return await _arun_qa_chain(qa_chain, query, documents)
+
+    # get/put check the index version in SQLite, so they run in a worker thread instead of on the event loop
+    result = await asyncio.to_thread(cache.get, index_name, vector)
+    if result is not None:
+        print(f"[Answer Cache] Hit for: {query!r}")
+        return result
+    start = time.perf_counter()
+    result = await _arun_qa_chain(qa_chain, query, documents)
+    await asyncio.to_thread(cache.put, index_name, query, vector, result, time.perf_counter() - start)
+    return result
@@ -0,0 +1,72 @@
+import re
+import zlib
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate detector based on MinHash signatures of word shingles
+    and locality-sensitive hashing. The first chunk of each group is kept as the
+    canonical one; later chunks whose estimated Jaccard similarity to it reaches
+    `threshold` are reported as its duplicates and their sources are merged.
+    """
+    def __init__(self, threshold=0.8, num_perm=128, bands=16, shingle_size=3, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+        self.sources = {}  # canonical key -> set of sources merged into it
+        self.duplicates = {}  # canonical key -> number of duplicates dropped
+        self.chunks_seen = 0
+
+    def signature(self, text):
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        size = min(self.shingle_size, len(tokens)) or 1
+        shingles = {" ".join(tokens[i:i + size]) for i in range(max(len(tokens) - size + 1, 1))}
+        hashes = np.array([zlib.crc32(s.encode("utf-8")) for s in shingles], dtype=np.int64)
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+    def add(self, key, text, source=None):
+        """Return the canonical key `text` duplicates, or None if it is kept as a new canonical chunk."""
+        self.chunks_seen += 1
+        signature = self.signature(text)
+        band_keys = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        candidates = {c for band, band_key in enumerate(band_keys) for c in self._buckets[band].get(band_key, ())}
+        for candidate in candidates:
+            if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                self.sources[candidate].add(source)
+                self.duplicates[candidate] += 1
+                return candidate
+
+        self._signatures[key] = signature
+        self.sources[key] = {source}
+        self.duplicates[key] = 0
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, []).append(key)
+        return None
+
+    def merged_sources(self):
+        """Canonical keys that absorbed duplicates from other sources, with all their sources."""
+        return {key: sorted(map(str, sources)) for key, sources in self.sources.items() if len(sources) > 1}
+
+    def report(self):
+        dropped = sum(self.duplicates.values())
+        return {
+            "chunks_seen": self.chunks_seen,
+            "chunks_kept": self.chunks_seen - dropped,
+            "duplicates_dropped": dropped,
+            "groups": [
+                {"canonical": key, "duplicates": count, "sources": sorted(map(str, self.sources[key]))}
+                for key, count in self.duplicates.items() if count
+            ],
+        }
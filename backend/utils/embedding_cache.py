@@ -0,0 +1,352 @@
+import os
+import asyncio
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are coordinated
+    fcntl = None
+
+load_dotenv()
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")  # Empty disables the cache
+EMBEDDING_DIMENSION = 768
+EMBEDDING_MEMO_SIZE = int(os.getenv("EMBEDDING_MEMO_SIZE", 4096))  # In-process LRU entries, 0 disables
+EMBEDDING_MEMO_REDIS = os.getenv("EMBEDDING_MEMO_REDIS", "False") == "True"  # Share embeddings across workers
+EMBEDDING_MEMO_REDIS_TTL = int(os.getenv("EMBEDDING_MEMO_REDIS_TTL", 7 * 24 * 3600))  # Seconds
+
+class EmbeddingCache:
+    """
+    Content-addressed store of embedding vectors keyed on hash(model, task_type, text).
+    Vectors live in a memory-mapped float32 file that doubles in size when full; the
+    key index is an append-only text file of "key<TAB>row" lines. Several processes
+    can share a directory: rows are allocated and index lines appended under an
+    exclusive lock on index.lock, after catching up with lines other processes wrote.
+    """
+    def __init__(self, directory=EMBEDDING_CACHE_DIR, dim=EMBEDDING_DIMENSION, initial_capacity=1024):
+        os.makedirs(directory, exist_ok=True)
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._index_path = os.path.join(directory, "index.tsv")
+        self._lock_path = os.path.join(directory, "index.lock")
+
+        self._rows = {}
+        self._count = 0
+        self._index_offset = 0
+        with self._file_lock():
+            self._read_index()
+            self._capacity = max(self._file_rows(), initial_capacity, self._count)
+            self._open_vectors()
+
+    @staticmethod
+    def make_key(model, task_type, text):
+        return hashlib.sha256(f"{model}\0{task_type.lower()}\0{text}".encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared by every process using this directory."""
+        with open(self._lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_index(self):
+        """Load index lines appended since the last read, including those written by other processes."""
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]  # A line still being written is read next time
+        self._index_offset += len(complete)
+        for line in complete.decode("utf-8").splitlines():
+            parts = line.split("\t")
+            if len(parts) == 2:  # A torn line from a crash is ignored
+                row = int(parts[1])
+                self._rows[parts[0]] = row
+                self._count = max(self._count, row + 1)
+
+    def _file_rows(self):
+        return os.path.getsize(self._vectors_path) // (4 * self.dim) if os.path.exists(self._vectors_path) else 0
+
+    def _remap(self, capacity):
+        self._vectors.flush()
+        del self._vectors
+        self._capacity = capacity
+        self._open_vectors()
+
+    def _follow_growth(self):
+        """Remap the vectors file when another process has grown it past our mapping."""
+        file_rows = self._file_rows()
+        if file_rows > self._capacity:
+            self._remap(file_rows)
+
+    def _open_vectors(self):
+        size = self._capacity * self.dim * 4
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim))
+
+    def _grow(self):
+        self._remap(self._capacity * 2)
+
+    def get(self, key):
+        """Return a copy of the cached vector, or None."""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self._read_index()
+                row = self._rows.get(key)
+                if row is None:
+                    return None
+            if row >= self._capacity:
+                self._follow_growth()
+            return np.array(self._vectors[row])
+
+    def put(self, key, vector):
+        with self._lock, self._file_lock():
+            self._read_index()
+            if key in self._rows:
+                return
+            row = self._count
+            self._follow_growth()
+            if row >= self._capacity:
+                self._grow()
+            self._vectors[row] = np.asarray(vector, dtype=np.float32)
+            self._vectors.flush()
+            with open(self._index_path, "ab") as f:
+                # Start on a fresh line if a crashed writer left a torn one behind
+                prefix = b"\n" if f.tell() > self._index_offset else b""
+                f.write(prefix + f"{key}\t{row}\n".encode("utf-8"))
+            self._index_offset = os.path.getsize(self._index_path)
+            self._rows[key] = row
+            self._count += 1
+
+    def get_or_compute(self, model, task_type, texts, compute):
+        """
+        Return embeddings for `texts`, calling `compute(missing_texts)` once for the
+        texts that are not cached yet and storing its results.
+        """
+        keys = [self.make_key(model, task_type, text) for text in texts]
+        vectors = [self.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            # Identical texts in one call are embedded once
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            computed = dict(zip(unique_texts, compute(unique_texts)))
+            for i in missing:
+                vectors[i] = computed[texts[i]]
+                self.put(keys[i], vectors[i])
+        return [list(map(float, vector)) for vector in vectors]
+
+class EmbeddingMemo:
+    """
+    Tiered embedding lookup shared by every embedding call site: an in-process LRU,
+    then an optional Redis tier shared between workers, then the on-disk
+    EmbeddingCache, and only then the embedding API. Vectors found in a slower tier
+    are copied into the faster ones, so a query text is embedded once and then
+    reused by the retriever, the answer cache and the follow-up generator.
+    """
+    def __init__(self, max_entries=EMBEDDING_MEMO_SIZE, redis_client=None, redis_ttl=EMBEDDING_MEMO_REDIS_TTL, backing=None):
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        self.redis_ttl = redis_ttl
+        self.backing = backing
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _remember(self, key, vector):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _redis_get(self, keys):
+        try:
+            values = self.redis_client.mget([f"embedding:{key}" for key in keys])
+        except Exception as e:
+            print(f"⚠️ Embedding memo Redis lookup failed: {e}")
+            return {}
+        return {key: np.frombuffer(value, dtype=np.float32) for key, value in zip(keys, values) if value}
+
+    def _redis_put(self, vectors):
+        try:
+            pipe = self.redis_client.pipeline()
+            for key, vector in vectors.items():
+                pipe.setex(f"embedding:{key}", self.redis_ttl, np.asarray(vector, dtype=np.float32).tobytes())
+            pipe.execute()
+        except Exception as e:
+            print(f"⚠️ Embedding memo Redis write failed: {e}")
+
+    def _lookup(self, model, task_type, texts):
+        """Return (keys, found, missing): vectors found in any tier, and {key: text} for the rest."""
+        keys = [EmbeddingCache.make_key(model, task_type, text) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        self.memory_hits += len(found)
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing and self.redis_client is not None:
+            from_redis = self._redis_get(list(missing))
+            self.redis_hits += len(from_redis)
+            for key, vector in from_redis.items():
+                found[key] = vector
+                self._remember(key, vector)
+                del missing[key]
+
+        if missing and self.backing is not None:
+            from_disk = {}
+            for key in list(missing):
+                vector = self.backing.get(key)
+                if vector is not None:
+                    found[key] = from_disk[key] = vector
+                    self._remember(key, vector)
+                    del missing[key]
+            self.disk_hits += len(from_disk)
+            if from_disk and self.redis_client is not None:
+                self._redis_put(from_disk)
+        self.misses += len(missing)
+        return keys, found, missing
+
+    def _store(self, found, missing, vectors):
+        computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+        for key, vector in computed.items():
+            found[key] = vector
+            self._remember(key, vector)
+            if self.backing is not None:
+                self.backing.put(key, vector)
+        if self.redis_client is not None:
+            self._redis_put(computed)
+
+    def get_or_compute(self, model, task_type, texts, compute):
+        """Same contract as EmbeddingCache.get_or_compute."""
+        keys, found, missing = self._lookup(model, task_type, texts)
+        if missing:
+            self._store(found, missing, compute(list(missing.values())))
+        return [list(map(float, found[key])) for key in keys]
+
+    async def aget_or_compute(self, model, task_type, texts, acompute):
+        """
+        Async variant; `acompute(missing_texts)` is awaited for the texts not found in any tier.
+        Redis and disk I/O run in a worker thread so the event loop is never blocked.
+        """
+        blocking = self.redis_client is not None or self.backing is not None
+        if blocking:
+            keys, found, missing = await asyncio.to_thread(self._lookup, model, task_type, texts)
+        else:
+            keys, found, missing = self._lookup(model, task_type, texts)
+        if missing:
+            vectors = await acompute(list(missing.values()))
+            if blocking:
+                await asyncio.to_thread(self._store, found, missing, vectors)
+            else:
+                self._store(found, missing, vectors)
+        return [list(map(float, found[key])) for key in keys]
+
+class CachedEmbeddings(Embeddings):
+    """LangChain embeddings wrapper that serves repeated texts from an EmbeddingMemo or EmbeddingCache."""
+    def __init__(self, embeddings, cache, model_name):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.get_or_compute(self.model_name, "retrieval_document", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.get_or_compute(
+            self.model_name, "retrieval_query", [text],
+            lambda texts: [self.embeddings.embed_query(texts[0])]
+        )[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not isinstance(self.cache, EmbeddingMemo):
+            return await super().aembed_documents(texts)
+        return await self.cache.aget_or_compute(self.model_name, "retrieval_document", texts, self.embeddings.aembed_documents)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if not isinstance(self.cache, EmbeddingMemo):
+            return await super().aembed_query(text)
+
+        async def compute(texts):
+            return [await self.embeddings.aembed_query(texts[0])]
+
+        return (await self.cache.aget_or_compute(self.model_name, "retrieval_query", [text], compute))[0]
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+_embedding_memo = None
+
+def get_embedding_cache():
+    """Return the process-wide EmbeddingCache, or None when EMBEDDING_CACHE_DIR is empty."""
+    global _embedding_cache
+    if not EMBEDDING_CACHE_DIR:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR)
+    return _embedding_cache
+
+def _connect_memo_redis():
+    import redis
+    try:
+        client = redis.StrictRedis(
+            host=os.getenv("REDIS_CLOUD_HOST"),
+            port=int(os.getenv("REDIS_CLOUD_PORT", 6379)),
+            password=os.getenv("REDIS_CLOUD_PASSWORD")
+        )
+        client.ping()
+        return client
+    except redis.RedisError as e:
+        print(f"⚠️ Embedding memo running without Redis: {e}")
+        return None
+
+def get_embedding_memo():
+    """Return the process-wide EmbeddingMemo, or None when every tier is disabled."""
+    global _embedding_memo
+    if EMBEDDING_MEMO_SIZE <= 0 and not EMBEDDING_MEMO_REDIS and not EMBEDDING_CACHE_DIR:
+        return None
+    backing = get_embedding_cache()
+    with _embedding_cache_lock:
+        if _embedding_memo is None:
+            redis_client = _connect_memo_redis() if EMBEDDING_MEMO_REDIS else None
+            _embedding_memo = EmbeddingMemo(redis_client=redis_client, backing=backing)
+    return _embedding_memo
+
+def get_embeddings(model="models/embedding-001"):
+    """Google embeddings for LangChain vector stores, served through the shared embedding memo when enabled."""
+    embeddings = GoogleGenerativeAIEmbeddings(model=model)
+    memo = get_embedding_memo()
+    if memo is None:
+        return embeddings
+    return CachedEmbeddings(embeddings, memo, model)
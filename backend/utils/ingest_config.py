@@ -0,0 +1,27 @@
+import os
+from dotenv import load_dotenv
+from utils.llm_cache import LLMResponseCache
+from utils.resources import get_resource
+
+load_dotenv()
+
+# Ingestion settings shared by create_vector_store.py and main/utils.py
+CHUNKER_BATCH_SIZE = int(os.getenv("CHUNKER_BATCH_SIZE", 0)) or None  # 0 keeps per-proposition routing
+CHUNKER_USE_EMBEDDINGS = os.getenv("CHUNKER_USE_EMBEDDINGS", "False") == "True"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))  # Texts per embedding request
+TABULAR_QA_INGESTION = os.getenv("TABULAR_QA_INGESTION", "True") == "True"  # One chunk per CSV row, no LLM calls
+CHUNKING_WORKERS = int(os.getenv("CHUNKING_WORKERS", 1))  # >1 chunks documents in a process pool
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 14))  # Shared by all chunking workers
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")  # Empty disables the chunker response cache
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", 100))
+LLM_CACHE_READ_ONLY = os.getenv("LLM_CACHE_READ_ONLY", "False") == "True"
+
+def get_chunker_options():
+    """AgenticChunker options, built on first use so importing this module doesn't open the response cache."""
+    return get_resource("chunker_options", lambda: {
+        "batch_size": CHUNKER_BATCH_SIZE,
+        "use_embeddings": CHUNKER_USE_EMBEDDINGS,
+        "response_cache": LLMResponseCache(
+            LLM_CACHE_PATH, max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024, read_only=LLM_CACHE_READ_ONLY
+        ) if LLM_CACHE_PATH else None,
+    })
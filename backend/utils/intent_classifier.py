@@ -0,0 +1,93 @@
+import os
+import csv
+import time
+import threading
+from dotenv import load_dotenv
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline, make_union
+
+load_dotenv()
+
+INTENT_CLASSIFIER_ENABLED = os.getenv("INTENT_CLASSIFIER_ENABLED", "True") == "True"
+INTENT_CLASSIFIER_THRESHOLD = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", 0.8))  # Probability needed to skip the LLM; checked on held-out queries in tests
+INTENT_TRAINING_DIR = os.getenv(
+    "INTENT_TRAINING_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Dataset")
+)
+
+def load_dataset_questions(directory=INTENT_TRAINING_DIR):
+    """Questions from every Q&A CSV (a 'Question' column) under `directory`, searched recursively."""
+    questions = []
+    if not os.path.exists(directory):
+        print(f"⚠️ Intent training directory does not exist: {directory}")
+        return questions
+
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[1].lower() != ".csv":
+                continue
+            try:
+                with open(os.path.join(root, file), newline="", encoding="utf-8-sig") as f:
+                    for row in csv.DictReader(f):
+                        question = (row.get("Question") or "").strip()
+                        if question:
+                            questions.append(question)
+            except Exception as e:
+                print(f"❌ Error reading questions from {file}: {e}")
+    return questions
+
+class IntentClassifier:
+    """
+    In-process intent classifier: word and character n-gram TF-IDF features
+    feeding a logistic regression, trained on labelled example queries.
+    predict() returns a label only when its probability reaches `threshold`,
+    otherwise None so the caller can ask the LLM instead. Local hits and
+    fallbacks are counted for stats().
+    """
+    def __init__(self, examples, threshold=INTENT_CLASSIFIER_THRESHOLD):
+        self.threshold = threshold
+        self.hits = 0
+        self.fallbacks = 0
+        self.local_time = 0.0
+        self._lock = threading.Lock()
+
+        texts = [text for texts in examples.values() for text in texts]
+        labels = [label for label, texts in examples.items() for _ in texts]
+        self.model = make_pipeline(
+            make_union(
+                TfidfVectorizer(lowercase=True, ngram_range=(1, 2), sublinear_tf=True),
+                TfidfVectorizer(lowercase=True, analyzer="char_wb", ngram_range=(2, 5), sublinear_tf=True),
+            ),
+            LogisticRegression(C=10.0, class_weight="balanced", max_iter=1000),
+        )
+        self.model.fit(texts, labels)
+
+    def predict_proba(self, query):
+        """Most likely label and its probability."""
+        probabilities = self.model.predict_proba([query])[0]
+        best = probabilities.argmax()
+        return str(self.model.classes_[best]), float(probabilities[best])
+
+    def predict(self, query):
+        """The label when the classifier is confident enough, else None."""
+        start = time.perf_counter()
+        label, confidence = self.predict_proba(query)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.local_time += elapsed
+            if confidence >= self.threshold:
+                self.hits += 1
+                return label
+            self.fallbacks += 1
+            return None
+
+    def stats(self):
+        lookups = self.hits + self.fallbacks
+        return {
+            "threshold": self.threshold,
+            "local_hits": self.hits,
+            "llm_fallbacks": self.fallbacks,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "avg_local_microseconds": round(self.local_time / lookups * 1e6, 1) if lookups else 0.0,
+        }
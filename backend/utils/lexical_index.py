@@ -0,0 +1,206 @@
+import os
+import re
+import asyncio
+import json
+import sqlite3
+import threading
+from typing import List
+from dotenv import load_dotenv
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+from database.ingest_manifest import get_index_version, get_manifest
+
+load_dotenv()
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "lexical_index.db")
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "True") == "True"  # Fuse keyword and vector search in the QA chains
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", 60))  # Reciprocal rank fusion constant
+HYBRID_RARE_TERM_RATIO = float(os.getenv("HYBRID_RARE_TERM_RATIO", 0.02))  # Largest share of chunks a rare term occurs in
+
+# Words that carry no topic of their own in a support question
+QUERY_STOP_WORDS = ENGLISH_STOP_WORDS | {"tell", "know", "want", "need", "like", "please", "hi", "hello", "thanks"}
+
+_stats = {"lexical_only": 0, "hybrid": 0}
+_stats_lock = threading.Lock()
+_coverage = {}  # index_name -> (index version, whether the keyword index holds all of it)
+
+def init_lexical_index(path=LEXICAL_INDEX_PATH):
+    """Create the full-text table if it doesn't exist."""
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+                text,
+                index_name UNINDEXED,
+                vector_id UNINDEXED,
+                metadata UNINDEXED,
+                tokenize = 'porter unicode61'
+            )
+        """)
+        conn.commit()
+
+def add_chunks(index_name, chunks_with_ids, path=LEXICAL_INDEX_PATH):
+    """Index (Document, vector_id) pairs for keyword search, replacing earlier rows with the same IDs."""
+    rows = [
+        (chunk.page_content, index_name, chunk_id, json.dumps(chunk.metadata, ensure_ascii=False, default=str))
+        for chunk, chunk_id in chunks_with_ids
+    ]
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "DELETE FROM chunks WHERE index_name = ? AND vector_id = ?",
+            [(index_name, chunk_id) for _, _, chunk_id, _ in rows]
+        )
+        conn.executemany("INSERT INTO chunks (text, index_name, vector_id, metadata) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+
+def delete_chunks(index_name, vector_ids, path=LEXICAL_INDEX_PATH):
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "DELETE FROM chunks WHERE index_name = ? AND vector_id = ?",
+            [(index_name, chunk_id) for chunk_id in vector_ids]
+        )
+        conn.commit()
+
+def lexical_gaps(index_name, manifest, path=LEXICAL_INDEX_PATH):
+    """Sources of `manifest` (as returned by get_manifest) with vectors missing from the keyword index."""
+    with sqlite3.connect(path) as conn:
+        indexed = {row[0] for row in conn.execute("SELECT vector_id FROM chunks WHERE index_name = ?", (index_name,))}
+    return [source for source, (_, vector_ids, _) in manifest.items() if not indexed.issuperset(vector_ids)]
+
+def covers_manifest(index_name, path=LEXICAL_INDEX_PATH):
+    """
+    True when the keyword index holds every vector the ingestion manifest records for `index_name`.
+    Rechecked whenever the index version changes; an index without a manifest is never covered.
+    """
+    version = get_index_version(index_name)
+    cached = _coverage.get(index_name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    covered = False
+    if version and os.path.exists(path):
+        try:
+            covered = not lexical_gaps(index_name, get_manifest(index_name), path)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not check keyword index coverage for '{index_name}': {e}")
+    _coverage[index_name] = (version, covered)
+    return covered
+
+def _match_count(conn, index_name, expression):
+    return conn.execute(
+        "SELECT count(*) FROM chunks WHERE chunks MATCH ? AND index_name = ?", (expression, index_name)
+    ).fetchone()[0]
+
+def _chunk_count(conn, index_name):
+    return conn.execute("SELECT count(*) FROM chunks WHERE index_name = ?", (index_name,)).fetchone()[0]
+
+def _ranked(conn, index_name, expression, k):
+    rows = conn.execute(
+        "SELECT text, metadata, -bm25(chunks) FROM chunks WHERE chunks MATCH ? AND index_name = ? "
+        "ORDER BY bm25(chunks) LIMIT ?",
+        (expression, index_name, k)
+    ).fetchall()
+    return [(Document(page_content=text, metadata=json.loads(metadata)), score) for text, metadata, score in rows]
+
+def keyword_search(index_name, query, k, path=LEXICAL_INDEX_PATH, rare_ratio=HYBRID_RARE_TERM_RATIO):
+    """
+    BM25 search over the chunks of one index.
+    Returns (results, strong) with results a list of (Document, score). A keyword
+    (a query word that is not a stop word) is rare when it occurs in at most
+    `rare_ratio` of the index's chunks. The match is strong when the query has a
+    rare keyword, every keyword occurs somewhere in the index, and some chunks
+    contain all the rare keywords; the results are then the best of those chunks.
+    Queries made only of common words ("What services do you offer?") are never strong.
+    """
+    terms = list(dict.fromkeys(term for term in re.findall(r"\w+", query.lower()) if len(term) > 1))
+    if not terms or not os.path.exists(path):
+        return [], False
+    keywords = [term for term in terms if term not in QUERY_STOP_WORDS]
+
+    with sqlite3.connect(path) as conn:
+        if keywords:
+            rare_limit = max(1, int(_chunk_count(conn, index_name) * rare_ratio))
+            frequencies = {term: _match_count(conn, index_name, f'"{term}"') for term in keywords}
+            rare = [term for term, frequency in frequencies.items() if 0 < frequency <= rare_limit]
+            if rare and all(frequencies.values()):
+                # Chunks must contain every rare keyword; the common ones only help the ranking
+                any_keyword = " OR ".join(f'"{term}"' for term in keywords)
+                all_rare = " AND ".join(f'"{term}"' for term in rare)
+                results = _ranked(conn, index_name, f"{all_rare} AND ({any_keyword})", k)
+                if results:
+                    return results, True
+        return _ranked(conn, index_name, " OR ".join(f'"{term}"' for term in keywords or terms), k), False
+
+def fuse_results(result_lists, k, rrf_k=HYBRID_RRF_K):
+    """Reciprocal rank fusion of ranked Document lists, de-duplicated by content."""
+    scores, documents = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            scores[doc.page_content] = scores.get(doc.page_content, 0.0) + 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(doc.page_content, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [documents[content] for content in ranked[:k]]
+
+def _count(kind):
+    with _stats_lock:
+        _stats[kind] += 1
+
+def retrieval_stats():
+    """How many retrievals were answered by keyword search alone versus fused with vector search."""
+    with _stats_lock:
+        total = _stats["lexical_only"] + _stats["hybrid"]
+        return {**_stats, "vector_search_skipped_ratio": _stats["lexical_only"] / total if total else 0.0}
+
+class HybridRetriever(BaseRetriever):
+    """
+    Keyword search over the local FTS5 index fused with the wrapped vector retriever.
+    Strong keyword matches are returned without calling the vector retriever at all,
+    provided the keyword index covers everything ingested into `index_name`;
+    otherwise both result lists are merged with reciprocal rank fusion. With no
+    keyword index for `index_name` it behaves like the vector retriever.
+    """
+    vector_retriever: BaseRetriever
+    index_name: str
+    k: int = 4
+    path: str = LEXICAL_INDEX_PATH
+
+    def _keyword_search(self, query):
+        # Contextual queries render earlier turns as "User:"/"Bot:" lines; keywords come from everything the
+        # user said, so a follow-up like "what about cloud" keeps the earlier topic's rare terms
+        user_lines = re.findall(r"^User:(.*)$", query, flags=re.MULTILINE)
+        try:
+            return keyword_search(self.index_name, " ".join(user_lines) if user_lines else query, self.k, self.path)
+        except Exception as e:
+            print(f"⚠️ Keyword search failed, using vector search only: {e}")
+            return [], False
+
+    def _lexical_only(self, strong):
+        # A keyword index missing some files can't stand in for vector search
+        return strong and covers_manifest(self.index_name, self.path)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        lexical, strong = self._keyword_search(query)
+        if self._lexical_only(strong):
+            _count("lexical_only")
+            return [doc for doc, _ in lexical]
+        _count("hybrid")
+        vector = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return fuse_results([vector, [doc for doc, _ in lexical]], self.k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # Both lookups read SQLite, so they run in a worker thread instead of blocking the event loop
+        lexical, strong = await asyncio.to_thread(self._keyword_search, query)
+        if await asyncio.to_thread(self._lexical_only, strong):
+            _count("lexical_only")
+            return [doc for doc, _ in lexical]
+        _count("hybrid")
+        vector = await self.vector_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return fuse_results([vector, [doc for doc, _ in lexical]], self.k)
+
+def hybrid_retriever(vector_retriever, index_name, k):
+    """Wrap a vector retriever with keyword search when HYBRID_RETRIEVAL is on."""
+    if not HYBRID_RETRIEVAL or not index_name:
+        return vector_retriever
+    return HybridRetriever(vector_retriever=vector_retriever, index_name=index_name, k=k)
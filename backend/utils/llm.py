@@ -1,13 +1,30 @@
 import os
+import json
+import hashlib
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
+from utils.resources import get_resource
 
 load_dotenv()
 api_key = os.getenv("GEMINI_API_KEY")
 
-def get_llm():
-    return ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",  
-        google_api_key=api_key,
-        temperature=0.5  
-    )
+def get_llm(model="gemini-2.0-flash", temperature=0.5, google_api_key=api_key, **params):
+    """
+    Return the pooled chat client for this (model, temperature, params) combination.
+    Clients are created once and shared, so their connection to the Gemini API is
+    kept open and reused across requests instead of being set up on every call.
+    A temperature or API key of None leaves the library default in place.
+    """
+    key = hashlib.sha256(
+        json.dumps([model, temperature, google_api_key, params], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+    def build():
+        options = dict(params)
+        if temperature is not None:
+            options["temperature"] = temperature
+        if google_api_key:
+            options["google_api_key"] = google_api_key
+        return ChatGoogleGenerativeAI(model=model, **options)
+
+    return get_resource(f"llm:{key}", build)
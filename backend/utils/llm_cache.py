@@ -0,0 +1,84 @@
+import time
+import json
+import hashlib
+import sqlite3
+
+class LLMResponseCache:
+    """
+    On-disk cache of model responses keyed on model name plus a hash of the prompt.
+    Least recently used entries are evicted once the stored responses exceed
+    `max_bytes`. In read-only mode lookups are served but nothing is written.
+    Connections are opened per operation, so the cache can be pickled into
+    chunking worker processes.
+    """
+    def __init__(self, path="llm_cache.db", max_bytes=100 * 1024 * 1024, read_only=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        if not read_only:
+            with sqlite3.connect(self.path) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        model TEXT NOT NULL,
+                        response TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                """)
+                conn.commit()
+
+    @staticmethod
+    def make_key(model, prompt, generation_config=None):
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(json.dumps(generation_config, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, model, prompt, generation_config=None):
+        """Return the cached response text, or None on a miss."""
+        key = self.make_key(model, prompt, generation_config)
+        try:
+            with sqlite3.connect(self.path, timeout=30) as conn:
+                row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self.read_only:
+                    conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                    conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ LLM cache lookup failed: {e}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, model, prompt, response, generation_config=None):
+        if self.read_only:
+            return
+        key = self.make_key(model, prompt, generation_config)
+        size = len(response.encode("utf-8"))
+        with sqlite3.connect(self.path, timeout=30) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO responses (key, model, response, size, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            """, (key, model, response, size, time.time()))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        print(f"🧹 LLM cache evicted {len(evicted)} entries.")
@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from typing import Any, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from utils.embedding_cache import EMBEDDING_DIMENSION
+
+load_dotenv()
+
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")  # "pinecone" or "local"
+LOCAL_VECTOR_STORE_DIR = os.getenv("LOCAL_VECTOR_STORE_DIR", "vector_store")
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store for a corpus small enough to scan exhaustively.
+    Normalized float32 vectors are saved to `<directory>/vectors.f32` and memory-mapped
+    read-only at startup; ids, texts and metadata sit alongside in `records.jsonl`.
+    A query is one matrix-vector product, so cosine search over a few thousand
+    768-dim vectors takes well under a millisecond and needs no network.
+    """
+    def __init__(self, directory: str, embedding: Optional[Embeddings] = None, dim: int = EMBEDDING_DIMENSION):
+        self.directory = directory
+        self.embedding = embedding
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._records_path = os.path.join(directory, "records.jsonl")
+        self._load()
+
+    @classmethod
+    def load(cls, index_name: str, embedding: Optional[Embeddings] = None) -> "LocalVectorStore":
+        """Open (or create) the local store that stands in for a Pinecone index."""
+        return cls(os.path.join(LOCAL_VECTOR_STORE_DIR, index_name), embedding)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    def _load(self):
+        self._records = []
+        if os.path.exists(self._records_path):
+            with open(self._records_path, encoding="utf-8") as f:
+                self._records = [json.loads(line) for line in f if line.strip()]
+        if self._records:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._records), self.dim))
+        else:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._rows = {record["id"]: row for row, record in enumerate(self._records)}
+
+    def _save(self, vectors, records):
+        os.makedirs(self.directory, exist_ok=True)
+        np.ascontiguousarray(vectors, dtype=np.float32).tofile(self._vectors_path + ".tmp")
+        with open(self._records_path + ".tmp", "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._records_path + ".tmp", self._records_path)
+        self._load()
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        """Embed and upsert texts; an existing id is overwritten."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [hashlib.sha256(text.encode("utf-8")).hexdigest()[:32] for text in texts]
+        new_vectors = self._normalize(self.embedding.embed_documents(texts))
+
+        with self._lock:
+            vectors = np.array(self._vectors)
+            records = list(self._records)
+            rows = dict(self._rows)
+            appended = []
+            for vector_id, text, metadata, vector in zip(ids, texts, metadatas, new_vectors):
+                record = {"id": vector_id, "text": text, "metadata": metadata}
+                if vector_id in rows:
+                    vectors[rows[vector_id]] = vector
+                    records[rows[vector_id]] = record
+                else:
+                    rows[vector_id] = len(records)
+                    records.append(record)
+                    appended.append(vector)
+            if appended:
+                vectors = np.vstack([vectors, np.stack(appended)])
+            self._save(vectors, records)
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        ids = set(ids or [])
+        with self._lock:
+            keep = [row for row, record in enumerate(self._records) if record["id"] not in ids]
+            self._save(np.array(self._vectors)[keep], [self._records[row] for row in keep])
+        return True
+
+    def update_metadata(self, metadata_by_id: dict):
+        """Merge metadata into existing records, like Pinecone's update(id=..., set_metadata=...)."""
+        with self._lock:
+            records = list(self._records)
+            for vector_id, metadata in metadata_by_id.items():
+                row = self._rows.get(vector_id)
+                if row is not None:
+                    records[row] = {**records[row], "metadata": {**records[row]["metadata"], **metadata}}
+            self._save(np.array(self._vectors), records)
+
+    def _search(self, vector, k: int, filter: Optional[dict] = None) -> List[Tuple[int, float]]:
+        vectors = self._vectors
+        if not len(vectors):
+            return []
+        scores = vectors @ self._normalize(vector)[0]
+        if filter:
+            allowed = np.array([
+                all(record["metadata"].get(key) == value for key, value in filter.items())
+                for record in self._records
+            ])
+            scores = np.where(allowed, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if np.isfinite(scores[row])]
+
+    def _document(self, row: int) -> Document:
+        record = self._records[row]
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4,
+                                               filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        return [(self._document(row), score) for row, score in self._search(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, kwargs.get("filter"))]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, kwargs.get("filter"))]
+
+    def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score(query, k, kwargs.get("filter"))
+
+    def query(self, vector: List[float], top_k: int = 3, include_metadata: bool = True, **kwargs: Any) -> dict:
+        """Pinecone Index.query() compatible lookup, with the text under metadata["text"]."""
+        matches = []
+        for row, score in self._search(vector, top_k, kwargs.get("filter")):
+            record = self._records[row]
+            match = {"id": record["id"], "score": score}
+            if include_metadata:
+                match["metadata"] = {**record["metadata"], "text": record["text"]}
+            matches.append(match)
+        return {"matches": matches}
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, index_name: str = "default", **kwargs: Any) -> "LocalVectorStore":
+        store = cls.load(index_name, embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+def open_vector_store(index_name: str, embedding: Embeddings) -> VectorStore:
+    """Open the vector store for an index on the backend chosen by VECTOR_STORE_BACKEND."""
+    if VECTOR_STORE_BACKEND == "local":
+        return LocalVectorStore.load(index_name, embedding)
+    from langchain_community.vectorstores import Pinecone as PineconeVectorStore
+    return PineconeVectorStore.from_existing_index(index_name=index_name, embedding=embedding)
@@ -1,27 +1,33 @@
 session_memories = {}
+# Intent labels stored on turns, shared by the FAQ agent and the service agent
+TURN_INTENTS = ["complaint", "affirmation", "general"]
 
 def get_memory_for_user(email):
     """
     Retrieve the last memory session list for a given user email.
     Creates a new session if one doesn't exist.
+    Each turn is a dict with the user's "query", the bot's "response" and the
+    "intent" classified for the query (one of TURN_INTENTS, None until it has been classified).
     """
     if email not in session_memories:
         session_memories[email] = []
     return session_memories[email]
 
-def add_to_memory(email, user_query, bot_response):
+def add_to_memory(email, user_query, bot_response, intent=None):
     """
-    Append the latest interaction to the user's memory.
+    Append the latest interaction to the user's memory and return the stored turn.
     """
-    formatted = f"User: {user_query}\nBot: {bot_response}"
-    session_memories[email].append(formatted)
+    turn = {"query": user_query, "response": bot_response, "intent": intent}
+    get_memory_for_user(email).append(turn)
     print(session_memories)
+    return turn
+
+def format_turn(turn):
+    """Render a stored turn as conversation text for prompts."""
+    return f"User: {turn['query']}\nBot: {turn['response']}"
 
 def build_context(email, latest_query, max_turns=3):
     memory = get_memory_for_user(email)
-    user_turns = [m.split("User:")[-1].strip() for m in memory if "User:" in m]
-    last_user_turns = user_turns[-max_turns:] if len(user_turns) >= max_turns else user_turns
-    context = "\n".join([f"User: {q}" for q in last_user_turns] + [f"User: {latest_query}"])
+    last_turns = [format_turn(turn).strip() for turn in memory[-max_turns:]]
+    context = "\n".join(last_turns + [f"User: {latest_query}"])
     return context
-
-
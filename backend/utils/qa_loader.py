@@ -0,0 +1,36 @@
+import os
+import csv
+from typing import List
+from langchain_core.documents import Document
+
+def load_qa_csv(file_path: str) -> List[Document]:
+    """
+    Read a Question,Answer (or Service,Description) CSV in one pass and return
+    one Document per row, ready to embed without agentic chunking. A title line
+    above the header becomes the category, otherwise the file name does.
+    """
+    with open(file_path, encoding="utf-8", newline="") as f:
+        rows = [[value.strip() for value in row] for row in csv.reader(f)]
+
+    header_index = next((i for i, row in enumerate(rows) if len([v for v in row if v]) >= 2), None)
+    if header_index is None:
+        raise ValueError(f"No header row found in {file_path}")
+
+    titles = [value for row in rows[:header_index] for value in row if value]
+    category = titles[0] if titles else os.path.splitext(os.path.basename(file_path))[0].replace("_", " ")
+    columns = [column for column in rows[header_index] if column]
+    width = len(columns)
+
+    documents = []
+    for row_number, row in enumerate(rows[header_index + 1:]):
+        if not any(row):
+            continue
+        if len(row) > width:
+            # Some questions contain unquoted commas; fold the extra leading fields back into the first column
+            row = [", ".join(row[:len(row) - width + 1])] + row[len(row) - width + 1:]
+        content = "\n".join(f"{column}: {value}" for column, value in zip(columns, row) if value)
+        documents.append(Document(
+            page_content=content,
+            metadata={"source": file_path, "row": row_number, "category": category, "content_type": "qa_pair"}
+        ))
+    return documents
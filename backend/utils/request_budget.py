@@ -0,0 +1,26 @@
+import time
+import multiprocessing
+
+class RequestBudget:
+    """
+    Sliding-window limit of `max_requests` per `period` seconds.
+    The counters live in shared memory, so one budget handed to every worker
+    of a process pool caps the pool as a whole rather than each worker.
+    """
+    def __init__(self, max_requests, period=60):
+        self.period = period
+        self._lock = multiprocessing.Lock()
+        self._timestamps = multiprocessing.Array('d', max_requests, lock=False)
+
+    def acquire(self):
+        """Block until a request slot is free, then claim it."""
+        while True:
+            with self._lock:
+                now = time.time()
+                oldest = min(range(len(self._timestamps)), key=self._timestamps.__getitem__)
+                wait = self._timestamps[oldest] + self.period - now
+                if wait <= 0:
+                    self._timestamps[oldest] = now
+                    return
+            print(f"Request budget exhausted. Waiting {wait:.1f} seconds...")
+            time.sleep(wait)
@@ -0,0 +1,90 @@
+import os
+import threading
+from dotenv import load_dotenv
+from utils.embedding_cache import get_embeddings
+from utils.local_vector_store import VECTOR_STORE_BACKEND, LocalVectorStore, open_vector_store
+
+load_dotenv()
+
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+PINECONE_INDEX_NAME1 = os.getenv("PINECONE_INDEX_NAME1")  # FAQ index name
+PRELOAD_RESOURCES = os.getenv("PRELOAD_RESOURCES", "False") == "True"  # Build everything in create_app
+
+_resources = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+def get_resource(name, factory):
+    """
+    Return the shared resource registered under `name`, building it with `factory()`
+    on first use. Each resource is built once per process; a factory that returns
+    None (a failed load) is retried on the next call instead of being cached.
+    """
+    resource = _resources.get(name)
+    if resource is not None:
+        return resource
+    with _locks_guard:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        resource = _resources.get(name)
+        if resource is None:
+            resource = factory()
+            if resource is not None:
+                _resources[name] = resource
+    return resource
+
+def get_shared_embeddings():
+    return get_resource("embeddings", get_embeddings)
+
+def get_vector_store(index_name):
+    def load():
+        try:
+            vector_store = open_vector_store(index_name, get_shared_embeddings())
+            print(f"[Vector Store] Loaded '{index_name}' successfully")
+            return vector_store
+        except Exception as e:
+            print(f"❌ Error loading vector store '{index_name}': {e}")
+            return None
+    return get_resource(f"vector_store:{index_name}", load)
+
+def get_search_index(index_name):
+    """Raw index for vector queries: a Pinecone Index, or the local store which answers the same query() calls."""
+    if VECTOR_STORE_BACKEND == "local":
+        return get_resource(f"vector_store:{index_name}", lambda: LocalVectorStore.load(index_name, get_shared_embeddings()))
+    from pinecone import Pinecone
+    client = get_resource("pinecone_client", lambda: Pinecone(api_key=PINECONE_API_KEY))
+    return get_resource(f"pinecone_index:{index_name}", lambda: client.Index(index_name))
+
+def get_service_qa_chain():
+    """RetrievalQA chain over the services index, shared by the service agent and the /query fallback."""
+    from main.utils import create_qa_chain
+    def build():
+        vector_store = get_vector_store(PINECONE_INDEX_NAME)
+        return create_qa_chain(vector_store) if vector_store is not None else None
+    return get_resource("qa_chain:service", build)
+
+def get_faq_qa_chain():
+    from main.utils import create_qa_chain1
+    def build():
+        vector_store = get_vector_store(PINECONE_INDEX_NAME1)
+        return create_qa_chain1(vector_store) if vector_store is not None else None
+    return get_resource("qa_chain:faq", build)
+
+def get_fused_faq_chain():
+    """Single-call answer-and-label chain over the FAQ index, used when FUSED_FAQ_MODE is on."""
+    from main.utils import create_fused_faq_chain
+    def build():
+        vector_store = get_vector_store(PINECONE_INDEX_NAME1)
+        return create_fused_faq_chain(vector_store) if vector_store is not None else None
+    return get_resource("qa_chain:fused_faq", build)
+
+def get_langgraph_flow():
+    from main.langgraph_flow import create_langgraph_flow
+    return get_resource("langgraph_flow", create_langgraph_flow)
+
+def preload_resources():
+    """Build the shared resources up front, e.g. before a pre-forking server starts its workers."""
+    get_service_qa_chain()
+    get_faq_qa_chain()
+    get_langgraph_flow()
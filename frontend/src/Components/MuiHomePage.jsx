@@ -6,6 +6,20 @@ import MuiNavbar from "./MuiNavbar";
 import ReactMarkdown from 'react-markdown';
 
 const API_URL = "http://127.0.0.1:5000";
+const FOLLOWUP_POLL_INTERVAL_MS = 700;
+const FOLLOWUP_POLL_ATTEMPTS = 30;
+
+// Follow-ups are generated after the answer is returned; poll until they are ready
+const pollFollowups = async (followupsId) => {
+  for (let attempt = 0; attempt < FOLLOWUP_POLL_ATTEMPTS; attempt++) {
+    await new Promise((resolve) => setTimeout(resolve, FOLLOWUP_POLL_INTERVAL_MS));
+    const response = await fetch(`${API_URL}/followups/${followupsId}`);
+    if (!response.ok) return [];
+    const data = await response.json();
+    if (data.status !== "pending") return data.followups || [];
+  }
+  return [];
+};
 
 const Chatbot = ({ input, setInput, sendMessage, followups, setFollowups }) => {
   const [isTyping, setIsTyping] = useState(false);
@@ -132,7 +146,13 @@ const Muihomepage = () => {
       if (data.chat_id) localStorage.setItem("chatId", data.chat_id);
 
       setMessages((prev) => [...prev, { role: "bot", text: data.answer }]);
-      if (data.followups) setFollowups(data.followups);
+      if (data.followups_id) {
+        pollFollowups(data.followups_id)
+          .then(setFollowups)
+          .catch((error) => console.error("❌ Error fetching follow-ups:", error));
+      } else if (data.followups) {
+        setFollowups(data.followups);
+      }
     } catch (error) {
       console.error("❌ Error fetching response:", error);
     } finally {